@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""单元测试（python -m pytest 或 python -m unittest discover）"""
+
+import xds
+
+# 测试不读写用户的编码缓存（~/.cache/xds）
+xds.ENCODING_CACHE_FILE = None
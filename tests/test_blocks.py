@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""区块划分：distribute_to_blocks 、多级区块树 build_block_tree 和命令行取值检查"""
+
+import io
+import argparse
+import unittest
+import contextlib
+
+import xds
+
+
+def make_chapters(sizes):
+    return [(i + 1, f"第{i + 1}章", '字' * size) for i, size in enumerate(sizes)]
+
+
+def distribute(chapters, num_blocks, balance='count'):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return xds.distribute_to_blocks(chapters, num_blocks, balance)
+
+
+class DistributeToBlocksTest(unittest.TestCase):
+
+    def test_count_balance_is_even_and_covers_all_chapters(self):
+        for total in range(0, 60):
+            chapters = make_chapters([1] * total)
+            for num_blocks in range(1, 12):
+                blocks = distribute(chapters, num_blocks)
+                self.assertEqual([c for block in blocks.values() for c in block], chapters)
+                sizes = [len(block) for block in blocks.values()]
+                if sizes:
+                    self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_size_balance_keeps_order_and_every_block_nonempty(self):
+        sizes = [(i * 37) % 101 + 1 for i in range(200)]
+        sizes[50] = 5000     # 单章很大也不能让后面的区块变空
+        chapters = make_chapters(sizes)
+        for num_blocks in (1, 2, 7, 26, 200):
+            blocks = distribute(chapters, num_blocks, 'size')
+            self.assertEqual(len(blocks), num_blocks)
+            self.assertTrue(all(blocks.values()))
+            self.assertEqual([c for block in blocks.values() for c in block], chapters)
+
+    def test_size_balance_is_close_to_target(self):
+        sizes = [(i * 37) % 101 + 1 for i in range(500)]
+        blocks = distribute(make_chapters(sizes), 10, 'size')
+        # 每个区块与平均值的偏差不超过一章
+        average = sum(sizes) / 10
+        for block in blocks.values():
+            self.assertLessEqual(abs(sum(len(content) for _, _, content in block) - average), max(sizes))
+
+    def test_only_size_balance_logs_block_sizes(self):
+        chapters = make_chapters([5] * 52)
+        for balance, expected in (('count', '区块 A: 第1-第2章 (共2章)'), ('size', '区块 A: 第1-第2章 (共2章, 10字)')):
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                xds.distribute_to_blocks(chapters, 26, balance)
+            self.assertEqual(log.getvalue().splitlines()[0], expected)
+
+
+class BlockTreeTest(unittest.TestCase):
+
+    def build(self, count, fanout, leaf_size):
+        blocks = distribute(make_chapters([10] * count), 26)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return blocks, xds.build_block_tree(blocks, fanout, leaf_size)
+
+    def leaves(self, children):
+        for child_id, chapters, grandchildren in children:
+            if grandchildren:
+                yield from self.leaves(grandchildren)
+            else:
+                yield child_id, chapters
+
+    def widest(self, children):
+        return max([len(children)] + [self.widest(grandchildren) for _, _, grandchildren in children])
+
+    def test_leaves_respect_leaf_size_and_keep_all_chapters(self):
+        blocks, tree = self.build(5000, 4, 30)
+        for letter, children in tree.items():
+            leaves = list(self.leaves(children))
+            self.assertTrue(all(len(chapters) <= 30 for _, chapters in leaves))
+            self.assertEqual([c for _, chapters in leaves for c in chapters], blocks[letter])
+            self.assertLessEqual(self.widest(children), 4)
+
+    def test_single_child_levels_are_not_split(self):
+        # fanout 1 曾导致无限递归
+        _, tree = self.build(500, 1, 2)
+        self.assertEqual(tree, {})
+
+    def test_fanout_and_leaf_size_arguments(self):
+        parse_fanout = xds.int_at_least(2)
+        self.assertEqual(parse_fanout('26'), 26)
+        for text in ('1', '0', '-3', 'x'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_fanout(text)
+        self.assertEqual(xds.int_at_least(0)('0'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""近似重复章节检测：MinHash 签名和 dedupe_chapters"""
+
+import io
+import os
+import sys
+import random
+import unittest
+import contextlib
+import subprocess
+
+import xds
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_text(rng, length):
+    return ''.join(rng.choice('的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要') for _ in range(length))
+
+
+class MinhashTest(unittest.TestCase):
+
+    def test_signature_does_not_depend_on_hash_seed(self):
+        script = "import xds; print(xds.minhash_signature('第一章 测试用的中文文本，内容足够长。' * 20))"
+        outputs = {subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, capture_output=True, text=True,
+                                  env=dict(os.environ, PYTHONHASHSEED=seed), check=True).stdout
+                   for seed in ('1', '2', '3')}
+        self.assertEqual(len(outputs), 1)
+
+
+class DedupeChaptersTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.original = random_text(rng, 2000)
+        self.chapters = [(1, '第1章', self.original), (2, '第2章', random_text(rng, 2000)),
+                         (3, '第3章 修正版', self.original[:1000] + '改' + self.original[1001:]),
+                         (4, '第4章', random_text(rng, 2000)), (5, '第5章 短', '短章')]
+
+    def dedupe(self, mode):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return xds.dedupe_chapters(self.chapters, threshold=0.8, mode=mode)
+
+    def test_merge_keeps_the_first_copy(self):
+        chapters, redirects = self.dedupe('merge')
+        self.assertEqual(redirects, {3: 1})
+        self.assertEqual([num for num, _, _ in chapters], [1, 2, 4, 5])
+
+    def test_flag_keeps_every_chapter(self):
+        chapters, _ = self.dedupe('flag')
+        self.assertEqual(len(chapters), 5)
+        self.assertIn('疑似重复: 第1章', chapters[2][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
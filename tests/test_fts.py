@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""全文检索库（xds_fts）：bigram 切分和跨书搜索"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import xds_fts
+
+
+class BigramsTest(unittest.TestCase):
+
+    def test_mixed_runs_split_at_the_script_boundary(self):
+        self.assertEqual(xds_fts.bigrams('他有3个苹果，Tom说张三丰来了'),
+                         '他有 3 个苹 苹果 tom 说张 张三 三丰 丰来 来了')
+        self.assertEqual(xds_fts.bigrams('第2章abc中x'), '第 2 章 abc 中 x')
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.dir, 'library.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def export(self, name, paragraphs, tokenizer='bigram'):
+        xds_fts.export_book(self.db, os.path.join(self.dir, name), name + '_search.html',
+                            [(1, '第一章', paragraphs)], tokenizer=tokenizer)
+
+    def search(self, query, book=None):
+        connection, tokenizer = xds_fts.open_library(self.db)
+        try:
+            hits, _, _, _ = xds_fts.search(connection, tokenizer, query, book=book)
+        finally:
+            connection.close()
+        return sorted((book_id, para) for book_id, _, para, _, _ in hits)
+
+    def test_bigram_finds_words_after_digits_and_letters(self):
+        self.export('book.htm', ['他有3个苹果和香蕉', '苹果很好吃', 'Tom说张三丰来了'])
+        self.assertEqual(self.search('苹果'), [(1, 0), (1, 1)])
+        self.assertEqual(self.search('3个苹果'), [(1, 0)])
+        self.assertEqual(self.search('说张三'), [(1, 2)])
+
+    def test_book_filter_matches_percent_and_underscore_literally(self):
+        for name in ('100%纯爱.htm', '1000纯爱.htm', 'a_b.htm', 'axb.htm'):
+            self.export(name, ['黄蓉与郭靖'])
+        self.assertEqual(self.search('黄蓉', book='100%'), [(1, 0)])
+        self.assertEqual(self.search('黄蓉', book='a_b'), [(3, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
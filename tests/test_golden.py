@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""当前实现与仓库中的金标准（golden/）一致；有意改变输出后用 python xds.py golden record --no-corpus 重新记录"""
+
+import io
+import unittest
+import contextlib
+
+import xds_golden
+
+
+class GoldenTest(unittest.TestCase):
+
+    def test_output_matches_golden(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            status = xds_golden.main(['check', '--strict'])
+        self.assertEqual(status, 0, log.getvalue())
+
+    def test_unknown_option_is_rejected(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(xds_golden.main(['check', '--set', 'balanse=size']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""书索引旁路文件（xds_index）和阅读服务的无索引查找"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import xds_index
+import xds_serve
+
+
+def brute_force(text, query):
+    return [i for i in range(len(text) - len(query) + 1) if text.startswith(query, i)]
+
+
+class BookIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.dir, 'book.htm')
+        with open(self.source, 'w', encoding='utf-8') as f:
+            f.write('<html>源文件</html>')
+        rng = random.Random(1)
+        self.chapters = [(i + 1, f"第{i + 1}章 标题", ''.join(rng.choice('黄蓉郭靖之的了a') for _ in range(400)))
+                         for i in range(30)]
+        self.text = xds_index.CHAPTER_SEPARATOR.join(content for _, _, content in self.chapters)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, postings):
+        path = os.path.join(self.dir, 'book_search.idx')
+        xds_index.write_book_index(path, self.source, self.chapters, 'utf-8', 0.9, postings=postings)
+        return path
+
+    def test_find_matches_brute_force(self):
+        queries = ['黄', '蓉', '黄蓉', '郭靖之', '之的了a', 'a', '黄蓉郭靖', '不在', '蓉\x00']
+        for postings in (True, False):
+            book_index = xds_index.BookIndex(self.write(postings))
+            try:
+                self.assertEqual(book_index.has_postings, postings)
+                for query in queries:
+                    self.assertEqual(list(book_index.find(query)), brute_force(self.text, query), (postings, query))
+            finally:
+                book_index.close()
+
+    def test_round_trip(self):
+        book_index = xds_index.BookIndex(self.write(True))
+        try:
+            self.assertEqual(book_index.chapters(), self.chapters)
+            self.assertEqual((book_index.encoding, book_index.encoding_score), ('utf-8', 0.9))
+            position = self.text.index(self.chapters[3][2])
+            self.assertEqual(book_index.chapter(position + 5)[:2], (4, '第4章 标题'))
+        finally:
+            book_index.close()
+
+    def test_reuse_only_for_the_same_source(self):
+        path = self.write(False)
+        self.assertIsNone(xds_index.open_book_index(path, self.source, postings=True))
+        book_index = xds_index.open_book_index(path, self.source)
+        self.assertIsNotNone(book_index)
+        book_index.close()
+
+        # 只改修改时间：内容的 SHA-1 一致，仍可沿用
+        os.utime(self.source, ns=(1, 1))
+        book_index = xds_index.open_book_index(path, self.source)
+        self.assertIsNotNone(book_index)
+        book_index.close()
+
+        with open(self.source, 'a', encoding='utf-8') as f:
+            f.write('追加')
+        self.assertIsNone(xds_index.open_book_index(path, self.source))
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            xds_index.BookIndex(self.source)
+
+
+class ServeFindAllTest(unittest.TestCase):
+
+    def test_chunked_scan_matches_brute_force(self):
+        rng = random.Random(2)
+        chunk = xds_serve.SCAN_CHUNK
+        xds_serve.SCAN_CHUNK = 7
+        try:
+            for _ in range(500):
+                text = ''.join(rng.choice('ab') for _ in range(rng.randint(0, 60)))
+                query = ''.join(rng.choice('ab') for _ in range(rng.randint(1, 4)))
+                self.assertEqual(list(xds_serve.find_all(text, query)), brute_force(text, query))
+        finally:
+            xds_serve.SCAN_CHUNK = chunk
+
+
+if __name__ == '__main__':
+    unittest.main()
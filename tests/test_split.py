@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""段落切分 smart_split 和无标题全文分页 split_into_pages"""
+
+import io
+import re
+import unittest
+import contextlib
+
+import xds
+
+
+class SmartSplitTest(unittest.TestCase):
+
+    def test_short_and_empty_text(self):
+        self.assertEqual(list(xds.smart_split('  短句。 ')), ['短句。'])
+        self.assertEqual(list(xds.smart_split('')), ['内容为空'])
+        self.assertEqual(list(xds.smart_split(' \n ')), ['内容为空'])
+
+    def test_lossless_and_bounded(self):
+        sentences = [f"第{i}句{'话' * (i % 40)}{'。！？'[i % 3]}" for i in range(300)]
+        text = ''.join(sentences)
+        parts = list(xds.smart_split(text, max_length=120))
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(''.join(parts), text)
+        self.assertTrue(all(len(part) <= 120 for part in parts))
+        # 只在句末切分
+        self.assertTrue(all(part[-1] in '。！？' for part in parts))
+
+    def test_closing_quotes_stay_with_their_sentence(self):
+        text = ('他说：“走吧。”' + '甲' * 30 + '。') * 20
+        parts = list(xds.smart_split(text, max_length=50))
+        self.assertEqual(''.join(parts), text)
+        self.assertFalse(any(part.startswith('”') for part in parts))
+
+    def test_closing_quote_at_the_limit_does_not_overflow(self):
+        # 句号正好在 max_length 之内、引号在外：退到前一个句子边界
+        text = ('甲' * 8 + '。”') * 30
+        for max_length in range(10, 45):
+            parts = list(xds.smart_split(text, max_length=max_length))
+            self.assertEqual(''.join(parts), text)
+            self.assertTrue(all(len(part) <= max_length for part in parts), max_length)
+            self.assertTrue(all(part.endswith('。”') for part in parts), max_length)
+
+    def test_overlong_sentence_is_kept_whole(self):
+        text = '短句。' + '长' * 300 + '。' + '尾句。'
+        parts = list(xds.smart_split(text, max_length=100))
+        self.assertEqual(''.join(parts), text)
+        self.assertIn('长' * 300 + '。', parts)
+
+
+class SplitIntoPagesTest(unittest.TestCase):
+
+    def test_headingless_text_is_paged_without_loss(self):
+        content = '<html><head><style>p{}</style></head><body>' + ''.join(
+            f"<p>段落{i}的内容。</p>" for i in range(5000)) + '</body></html>'
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = list(xds.split_into_pages(content, page_size=3000))
+        self.assertGreater(len(pages), 10)
+        self.assertEqual([num for num, _, _ in pages], list(range(1, len(pages) + 1)))
+        found = [int(n) for _, _, text in pages for n in re.findall(r'段落(\d+)', text)]
+        self.assertEqual(found, list(range(5000)))
+
+    def test_script_and_style_are_never_split(self):
+        code = '<script>var x = "</p>";' + '秘密代码();\n' * 400 + '</script>'
+        style = '<STYLE>' + '.x { color: red; } /* 样式注释 */\n' * 200 + '</STYLE>'
+        paragraphs = [f"<p>段落{i}的内容。</p>" for i in range(3000)]
+        paragraphs.insert(200, code)
+        paragraphs.insert(1200, style)
+        paragraphs.insert(2000, code)
+        content = '<html><body>' + ''.join(paragraphs) + '</body></html>'
+        for page_size in (1000, 3000, 7000):
+            with contextlib.redirect_stdout(io.StringIO()):
+                pages = list(xds.split_into_pages(content, page_size=page_size))
+            text = ''.join(text for _, _, text in pages)
+            self.assertNotIn('秘密代码', text)
+            self.assertNotIn('样式注释', text)
+            found = [int(n) for n in re.findall(r'段落(\d+)', text)]
+            self.assertEqual(found, list(range(3000)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""后缀数组（xds_suffix）：SA-IS 构建和子串查找"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import xds_suffix
+
+
+class BuildSuffixArrayTest(unittest.TestCase):
+
+    def test_matches_sorted_suffixes(self):
+        rng = random.Random(3)
+        texts = ['', 'a', 'aaaaaaaa', 'abababab', 'mississippi', '黄蓉黄蓉郭靖黄']
+        texts += [''.join(rng.choice('abc') for _ in range(rng.randint(1, 200))) for _ in range(200)]
+        texts += [''.join(rng.choice('的一是了我不人在') for _ in range(300)) for _ in range(20)]
+        for text in texts:
+            expected = sorted(range(len(text)), key=lambda i: text[i:])
+            self.assertEqual(list(xds_suffix.build_suffix_array(text)), expected, text)
+
+
+class SuffixArrayFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = random.Random(4)
+        self.chapters = [(i * 2 + 1, f"第{i * 2 + 1}章", ''.join(rng.choice('黄蓉郭靖之') for _ in range(300)))
+                         for i in range(20)]
+        self.text = xds_suffix.CHAPTER_SEPARATOR.join(content for _, _, content in self.chapters)
+        self.path = os.path.join(self.dir, 'book_search.sa')
+        xds_suffix.write_suffix_array(self.path, self.chapters)
+        self.suffix_array = xds_suffix.SuffixArray(self.path)
+
+    def tearDown(self):
+        self.suffix_array.close()
+        shutil.rmtree(self.dir)
+
+    def test_find_and_count_match_brute_force(self):
+        for query in ['黄', '黄蓉', '郭靖之黄', '蓉蓉蓉', '不在', '之\x00黄']:
+            expected = [i for i in range(len(self.text)) if self.text.startswith(query, i)]
+            self.assertEqual(self.suffix_array.find(query), expected, query)
+            self.assertEqual(self.suffix_array.count(query), len(expected), query)
+
+    def test_chapter_lookup(self):
+        position = self.text.index(self.chapters[5][2]) + 10
+        num, title, start, end = self.suffix_array.chapter(position)
+        self.assertEqual((num, title), (11, '第11章'))
+        self.assertEqual(self.text[start:end], self.chapters[5][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""监视模式：命令行的输出目录和 inotify 事件"""
+
+import os
+import unittest
+import tempfile
+
+import xds
+
+
+class WatchArgumentsTest(unittest.TestCase):
+
+    def test_output_dir_is_parsed(self):
+        args = xds.build_arg_parser().parse_args(['--watch', 'books', '-o', 'out'])
+        self.assertEqual(args.watch, ['books'])
+        self.assertEqual(args.output_dir, 'out')
+
+
+class InotifyEventsTest(unittest.TestCase):
+
+    def test_deleted_and_renamed_files_are_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            old_path = os.path.join(directory, 'a.txt')
+            with open(old_path, 'w', encoding='utf-8') as f:
+                f.write('第一章')
+            inotify = xds.open_inotify([directory])
+            if inotify is None:
+                self.skipTest("inotify 不可用")
+            try:
+                new_path = os.path.join(directory, 'b.txt')
+                os.rename(old_path, new_path)
+                self.assertEqual(xds.read_inotify_events(inotify[0], inotify[1], 1.0), {old_path, new_path})
+                os.remove(new_path)
+                self.assertEqual(xds.read_inotify_events(inotify[0], inotify[1], 1.0), {new_path})
+            finally:
+                os.close(inotify[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,15 +5,226 @@ import re
 import os
 import sys
 import time
+import argparse
+import glob
+import json
+import hashlib
+import codecs
+import contextlib
+import io
+import select
+import struct
+import ctypes
+import ctypes.util
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from bisect import bisect_left
+from itertools import accumulate
 from pathlib import Path
 
-def process_large_html_file(input_file, output_file=None):
-    """处理大型HTML文件 - 适用于411MB+的文件"""
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 分阶段统计 - None 表示未启用；启用时为 {阶段名: 统计}（保持插入顺序）
+METRICS = None
+METRICS_SCHEMA = 'xds-metrics/1'
+# 内存分析：在顶层阶段边界做 tracemalloc 快照
+MEMORY_PROFILE = False
+MEMORY_TOP_SITES = 5
+
+def max_rss_bytes():
+    """进程最大常驻内存（字节），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def take_memory_snapshot():
+    """tracemalloc 快照（排除 tracemalloc 自身的分配）"""
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ))
+
+def payload_size(obj):
+    """统计用：文本、字节或章节列表的UTF-8字节数"""
+    if obj is None or isinstance(obj, (int, float)):
+        return 0
+    if isinstance(obj, bytes):
+        return len(obj)
+    if isinstance(obj, str):
+        return len(obj.encode('utf-8', 'surrogatepass'))
+    if isinstance(obj, dict):
+        return sum(payload_size(value) for value in obj.values())
+    return sum(payload_size(item) for item in obj)
+
+@contextlib.contextmanager
+def measure_stage(name, data_in=None, parent=None):
+    """统计一个处理阶段：墙钟时间、CPU时间、输入输出字节数
+
+    同名阶段多次调用时累加；调用方可在 record['out'] 放入输出数据。未启用统计时几乎无开销
+    启用内存分析时，顶层阶段另外记录 tracemalloc 峰值、增长最多的分配位置和进程最大RSS
+    """
+    record = {}
+    if METRICS is None:
+        yield record
+        return
+    
+    profile_memory = MEMORY_PROFILE and parent is None
+    if profile_memory:
+        start_snapshot = take_memory_snapshot()
+        start_traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    
+    # 进入时登记，保证报告中的阶段按开始顺序排列
+    stage = METRICS.setdefault(name, {
+        'name': name, 'parent': parent, 'calls': 0,
+        'wall_s': 0.0, 'cpu_s': 0.0, 'bytes_in': 0, 'bytes_out': 0,
+    })
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        stage['calls'] += 1
+        stage['wall_s'] += wall
+        stage['cpu_s'] += cpu
+        stage['bytes_in'] += payload_size(data_in)
+        stage['bytes_out'] += payload_size(record.get('out'))
+        
+        if profile_memory:
+            end_traced, peak_traced = tracemalloc.get_traced_memory()
+            top_stats = take_memory_snapshot().compare_to(start_snapshot, 'lineno')[:MEMORY_TOP_SITES]
+            stage['memory'] = {
+                'start_bytes': start_traced,
+                'end_bytes': end_traced,
+                'peak_bytes': peak_traced,
+                'peak_delta_bytes': peak_traced - start_traced,
+                'max_rss_bytes': max_rss_bytes(),
+                'top_allocations': [
+                    {
+                        'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        'size_diff_bytes': stat.size_diff,
+                        'count_diff': stat.count_diff,
+                    }
+                    for stat in top_stats
+                ],
+            }
+
+def build_metrics_report(input_file, output_file, result, total_wall, total_cpu):
+    """整理分阶段统计为稳定的JSON结构"""
+    def throughput(size, seconds):
+        return round(size / (1024 * 1024) / seconds, 3) if seconds > 0 else None
+    
+    stages = []
+    for stage in (METRICS or {}).values():
+        stage = dict(stage)
+        stage['wall_s'] = round(stage['wall_s'], 6)
+        stage['cpu_s'] = round(stage['cpu_s'], 6)
+        stage['mb_per_s'] = throughput(stage['bytes_in'], stage['wall_s'])
+        stages.append(stage)
+    
+    input_bytes = os.path.getsize(input_file)
+    with open(os.path.abspath(__file__), 'rb') as f:
+        script_hash = hashlib.sha1(f.read()).hexdigest()[:12]
+    
+    return {
+        'schema': METRICS_SCHEMA,
+        'script_hash': script_hash,
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'input_file': os.path.abspath(input_file),
+        'output_file': os.path.abspath(output_file),
+        'input_bytes': input_bytes,
+        'output_bytes': result['output_size'],
+        'chapters': result['chapters'],
+        'encoding': (result.get('encoding') or (None,))[0],
+        'total': {
+            'wall_s': round(total_wall, 6),
+            'cpu_s': round(total_cpu, 6),
+            'mb_per_s': throughput(input_bytes, total_wall),
+        },
+        'max_rss_bytes': max_rss_bytes(),
+        'stages': stages,
+    }
+
+def print_memory_report(report):
+    """打印各阶段内存峰值和主要分配位置"""
+    mb = 1024 * 1024
+    print("\n内存分析 (tracemalloc):")
+    print(f"{'阶段':<12}{'峰值(MB)':>10}{'峰值增量(MB)':>14}{'结束(MB)':>10}{'最大RSS(MB)':>13}")
+    for stage in report['stages']:
+        memory = stage.get('memory')
+        if not memory:
+            continue
+        max_rss = f"{memory['max_rss_bytes'] / mb:.1f}" if memory['max_rss_bytes'] else '-'
+        print(f"{stage['name']:<12}{memory['peak_bytes'] / mb:>12.2f}{memory['peak_delta_bytes'] / mb:>16.2f}"
+              f"{memory['end_bytes'] / mb:>12.2f}{max_rss:>15}")
+        for site in memory['top_allocations']:
+            if site['size_diff_bytes'] > 0:
+                print(f"    {site['size_diff_bytes'] / mb:+9.2f} MB  {site['site']}")
+    if report.get('max_rss_bytes'):
+        print(f"进程最大RSS: {report['max_rss_bytes'] / mb:.1f} MB")
+
+def print_metrics_report(report):
+    """打印分阶段统计"""
+    print("\n阶段统计:")
+    print(f"{'阶段':<12}{'墙钟(秒)':>10}{'CPU(秒)':>10}{'输入(MB)':>10}{'输出(MB)':>10}{'MB/s':>9}")
+    for stage in report['stages']:
+        name = ('  ' + stage['name']) if stage['parent'] else stage['name']
+        mb_per_s = f"{stage['mb_per_s']:.1f}" if stage['mb_per_s'] is not None else '-'
+        print(f"{name:<12}{stage['wall_s']:>12.3f}{stage['cpu_s']:>11.3f}"
+              f"{stage['bytes_in'] / (1024*1024):>12.2f}{stage['bytes_out'] / (1024*1024):>12.2f}{mb_per_s:>9}")
+    total = report['total']
+    print(f"{'合计':<12}{total['wall_s']:>12.3f}{total['cpu_s']:>11.3f}")
+
+def process_large_html_file(input_file, output_file=None, dedup=None, dedup_threshold=0.8,
+                            balance='count', fanout=26, leaf_size=200, metrics_json=None,
+                            profile_memory=False, profile='default', assets='inline', assets_dir=None,
+                            markup='full', minify=False, fts=None, fts_tokenizer='trigram', catalog_dir=None,
+                            suffix_array=False, index=None, encoding=None):
+    """处理大型HTML文件 - 适用于411MB+的文件
+
+    dedup: None 不检测重复章节；'merge' 合并近似重复章节；'flag' 仅在标题中标记
+    balance: 区块分配方式，'count' 按章节数，'size' 按文本字节数
+    fanout, leaf_size: 区块超过 leaf_size 章时拆分为最多 fanout 个子区块（leaf_size=0 不拆分）
+    metrics_json: 输出分阶段统计（耗时、CPU、字节数、吞吐）到该JSON文件
+    profile_memory: 用 tracemalloc 统计各阶段内存峰值和主要分配位置（明显变慢）
+    profile: 页面主题，内置 'default'、'h5-compact'，或主题文件（JSON）路径
+    assets: 'inline' 样式和脚本内嵌在页面中；'external' 写入共享的资源目录，页面只引用
+    assets_dir: external 模式的资源目录（默认: 输出文件所在目录下的 assets）
+    markup: 'full' 完整标记；'compact' 精简章节和段落标记，图标、链接和段落id由页面脚本生成
+    minify: 压缩页面模板中的样式和脚本（去掉注释和多余空白）
+    fts: 同时把章节和段落导出到该 SQLite 检索库（FTS5），可用 query 子命令搜索
+    fts_tokenizer: 新建检索库时的分词方式，'trigram' 或 'bigram'
+    catalog_dir: 书库模式的索引目录，写入本书的章节列表和词表（见 xds_library）
+    suffix_array: 对章节正文建后缀数组，写入页面旁的 <输出文件名>.sa（见 xds_suffix）
+    index: 'chapters' 把分章结果写入页面旁的 <输出文件名>.idx，'postings' 另加位置索引（见 xds_index）；
+        索引文件由当前源文件生成时直接取用其中的章节，跳过读取和分章
+    encoding: 指定源文件编码，不做编码检测（索引文件的编码与之不同时重新分章）
+    
+    成功时返回 {'output_file', 'output_size', 'chapters', 'time', 'encoding'}，失败返回 None
+    """
     
     if not os.path.exists(input_file):
         print(f"错误: 输入文件 '{input_file}' 不存在")
         return
     
+    try:
+        profile = load_profile(profile)
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法加载主题 '{profile}': {e}")
+        return
+    
     # 自动生成输出文件名
     if output_file is None:
         input_path = Path(input_file)
@@ -23,55 +234,266 @@ def process_large_html_file(input_file, output_file=None):
     file_size = os.path.getsize(input_file)
     print(f"文件大小: {file_size / (1024*1024):.2f} MB")
     
-    start_time = time.time()
-    
-    # 使用智能编码检测读取文件
-    content = read_file_smart_encoding(input_file)
-    if content is None:
-        print("错误: 无法读取文件，请检查文件编码")
-        return
-    
-    print(f"文件读取完成，总长度: {len(content)} 字符")
-    
-    # 提取章节 - 使用更通用的模式
-    chapters = extract_chapters(content)
-    print(f"成功提取章节: {len(chapters)} 个")
-    
-    if len(chapters) == 0:
-        print("警告: 未找到章节，将创建单章节文件")
-        chapters = [(1, "全文内容", content[:500000])]  # 限制内容长度
-    
-    # 分配到区块
-    blocks = distribute_to_blocks(chapters)
-    
-    # 生成HTML
-    html_content = generate_search_html(blocks, len(chapters), input_file)
-    
-    # 写入文件 - 使用UTF-8编码避免编码问题
+    global METRICS, MEMORY_PROFILE
+    METRICS = {} if (metrics_json or profile_memory) else None
+    MEMORY_PROFILE = profile_memory
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        if profile_memory:
+            tracemalloc.start()
+        start_time = time.time()
+        cpu_start = time.process_time()
         
-        output_size = os.path.getsize(output_file)
-        processing_time = time.time() - start_time
+        # 索引文件由当前源文件生成时，直接取用其中的分章结果
+        book_index = None
+        if index:
+            import xds_index
+            index_file = xds_index.sidecar_path(output_file)
+            with measure_stage('index_load') as stage:
+                book_index = xds_index.open_book_index(index_file, input_file, postings=index == 'postings')
+                if book_index and encoding and book_index.encoding != encoding:
+                    book_index.close()
+                    book_index = None
+                if book_index:
+                    chapters = book_index.chapters()
+                    ENCODING_HINTS[os.path.abspath(input_file)] = (book_index.encoding, book_index.encoding_score)
+                    book_index.close()
+                    stage['out'] = chapters
         
-        print("\n处理完成!")
-        print(f"输出文件: {output_file}")
-        print(f"输出大小: {output_size / 1024:.1f} KB")
-        print(f"总章节: {len(chapters)} 章")
-        print(f"处理时间: {processing_time:.1f} 秒")
-        print("功能: 支持全文搜索 + 导航链接 + 章节锚点 + 字体调整 + 折叠功能 + 彩色文本 + 加粗文本")
+        if book_index:
+            print(f"沿用索引文件: {index_file} (编码 {book_index.encoding}, {len(chapters)} 章)")
+        else:
+            # 使用智能编码检测读取文件
+            with measure_stage('read') as stage:
+                content = read_file_smart_encoding(input_file, encoding)
+                stage['out'] = content
+            if METRICS is not None:
+                METRICS['read']['bytes_in'] = file_size
+            if content is None:
+                print("错误: 无法读取文件，请检查文件编码")
+                return
+            
+            print(f"文件读取完成，总长度: {len(content)} 字符")
+            
+            # 提取章节 - 使用更通用的模式
+            with measure_stage('extract', content) as stage:
+                chapters = extract_chapters(content)
+                print(f"成功提取章节: {len(chapters)} 个")
+                
+                if len(chapters) == 0:
+                    print("警告: 未找到章节，将按页分割全文")
+                    chapters = list(split_into_pages(content))
+                stage['out'] = chapters
         
-    except Exception as e:
-        print(f"写入文件时出错: {e}")
-
-def read_file_smart_encoding(file_path):
-    """智能检测文件编码并读取 - 不使用外部库"""
+        # 去重之前的分章结果写入索引文件
+        extracted_chapters = chapters
+        
+        # 近似重复章节检测（可选）
+        redirects = {}
+        if dedup:
+            with measure_stage('dedup', chapters) as stage:
+                chapters, redirects = dedupe_chapters(chapters, threshold=dedup_threshold, mode=dedup)
+                stage['out'] = chapters
+        
+        # 分配到区块
+        with measure_stage('distribute', chapters):
+            blocks = distribute_to_blocks(chapters, balance=balance)
+            block_tree = build_block_tree(blocks, fanout, leaf_size, balance) if leaf_size else None
+        
+        # 生成HTML
+        shared_assets = asset_links = None
+        if assets == 'external':
+            page_dir = os.path.dirname(os.path.abspath(output_file))
+            assets_dir = assets_dir or os.path.join(page_dir, 'assets')
+            shared_assets = page_assets(profile, markup, minify)
+            asset_links = asset_hrefs(shared_assets, assets_dir, page_dir)
+        with measure_stage('render', chapters) as stage:
+            html_content = generate_search_html(blocks, len(chapters), input_file, redirects, block_tree, profile,
+                                                asset_links, markup, minify)
+            stage['out'] = html_content
+        
+        # 写入文件 - 使用UTF-8编码避免编码问题；出错时报告是哪个阶段
+        failed_stage = '写入文件'
+        try:
+            with measure_stage('write', html_content):
+                if shared_assets:
+                    write_page_assets(shared_assets, assets_dir)
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(html_content)
+            
+            # 导出到检索库 - 段落与页面中的段落一致
+            if fts:
+                import xds_fts
+                failed_stage = '导出检索库'
+                with measure_stage('fts', chapters):
+                    book = [(chap_num, chap_title, list(smart_split(chap_content)))
+                            for chap_num, chap_title, chap_content in chapters]
+                    source_encoding = (ENCODING_HINTS.get(os.path.abspath(input_file)) or (None,))[0]
+                    fts_paragraphs = xds_fts.export_book(fts, input_file, os.path.abspath(output_file), book,
+                                                         source_encoding, fts_tokenizer)
+
+            # 书库模式：本书的词表，之后合并成跨书分片索引
+            if catalog_dir:
+                import xds_library
+                failed_stage = '写入书库索引'
+                with measure_stage('catalog', chapters):
+                    xds_library.write_book_index(catalog_dir, input_file, output_file, chapters)
+
+            # 索引文件：之后的构建、query 和阅读服务直接映射
+            if index and not book_index:
+                failed_stage = '写入索引文件'
+                with measure_stage('index', extracted_chapters):
+                    source_encoding, encoding_score = ENCODING_HINTS.get(os.path.abspath(input_file), (None, 0.0))
+                    xds_index.write_book_index(index_file, input_file, extracted_chapters, source_encoding,
+                                               encoding_score, postings=index == 'postings',
+                                               settings={'index': index})
+            
+            # 后缀数组：任意子串精确查找
+            if suffix_array:
+                import xds_suffix
+                failed_stage = '写入后缀数组'
+                with measure_stage('suffix_array', chapters):
+                    suffix_array_file = xds_suffix.suffix_array_path(output_file)
+                    xds_suffix.write_suffix_array(suffix_array_file, chapters)
+            
+            output_size = os.path.getsize(output_file)
+            processing_time = time.time() - start_time
+            
+            print("\n处理完成!")
+            print(f"输出文件: {output_file}")
+            print(f"输出大小: {output_size / 1024:.1f} KB")
+            print(f"总章节: {len(chapters)} 章")
+            print(f"处理时间: {processing_time:.1f} 秒")
+            # 只在 --minify 时统计压缩节省的字节数
+            minified_bytes = compile_page_template(profile, assets == 'external', markup, minify)[2] if minify else 0
+            if minify:
+                print(f"样式/脚本压缩: 节省 {minified_bytes / 1024:.1f} KB")
+            if fts:
+                print(f"检索库: {fts} (写入 {fts_paragraphs} 个段落)")
+            if suffix_array:
+                print(f"后缀数组: {suffix_array_file}")
+            if index and not book_index:
+                print(f"索引文件: {index_file}")
+            print("功能: 支持全文搜索 + 导航链接 + 章节锚点 + 字体调整 + 折叠功能 + 彩色文本 + 加粗文本")
+            
+            result = {
+                'output_file': str(output_file),
+                'output_size': output_size,
+                'chapters': len(chapters),
+                'time': processing_time,
+                'encoding': ENCODING_HINTS.get(os.path.abspath(input_file)),
+                'minified_bytes': minified_bytes,
+            }
+            
+            if METRICS is not None:
+                failed_stage = '写入阶段统计'
+                METRICS['write']['bytes_out'] = output_size
+                report = build_metrics_report(input_file, output_file, result, processing_time,
+                                              time.process_time() - cpu_start)
+                print_metrics_report(report)
+                if profile_memory:
+                    print_memory_report(report)
+                if metrics_json:
+                    with open(metrics_json, 'w', encoding='utf-8') as f:
+                        json.dump(report, f, ensure_ascii=False, indent=2)
+                    print(f"阶段统计已写入: {metrics_json}")
+            
+            return result
+            
+        except Exception as e:
+            print(f"{failed_stage}时出错: {e}")
+    finally:
+        if profile_memory:
+            tracemalloc.stop()
+            MEMORY_PROFILE = False
+
+# 本进程内已做出的编码判断 {绝对路径: (编码, 得分)}，重复处理同一文件时优先尝试
+ENCODING_HINTS = {}
+
+# 跨进程的编码判断缓存 {绝对路径: {文件指纹, 编码, 得分}}，指纹一致时不再检测；设为 None 不使用
+ENCODING_CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                   'xds', 'encoding-cache.json')
+
+# 缓存格式或编码检测规则改变时递增，旧的判断作废
+ENCODING_CACHE_VERSION = 1
+
+# 指纹中哈希的首尾字节数
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# 缓存最多记录的文件数，超出时丢弃最早的
+ENCODING_CACHE_ENTRIES = 1000
+
+def file_fingerprint(file_path, raw_data):
+    """文件指纹：大小、修改时间、首尾各 ENCODING_SAMPLE_SIZE 字节的哈希"""
+    return [len(raw_data), os.stat(file_path).st_mtime_ns,
+            hashlib.sha1(raw_data[:ENCODING_SAMPLE_SIZE]).hexdigest(),
+            hashlib.sha1(raw_data[-ENCODING_SAMPLE_SIZE:]).hexdigest()]
+
+def load_encoding_cache():
+    """读取编码判断缓存（不存在、损坏或版本不同时为空）"""
+    if not ENCODING_CACHE_FILE:
+        return {}
+    try:
+        with open(ENCODING_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != ENCODING_CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+def save_encoding_cache(updates):
+    """把新的判断 {绝对路径: 记录} 并入编码判断缓存；缓存目录不可写时忽略
+
+    加锁后重新读取缓存再合并写回（先写临时文件再改名），并行的批量子进程不会互相覆盖
+    """
+    if not ENCODING_CACHE_FILE:
+        return
+    temp_path = f"{ENCODING_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(ENCODING_CACHE_FILE), exist_ok=True)
+        with open(ENCODING_CACHE_FILE + '.lock', 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            cache = load_encoding_cache()
+            for key, entry in updates.items():
+                cache.pop(key, None)
+                cache[key] = entry
+            while len(cache) > ENCODING_CACHE_ENTRIES:
+                del cache[next(iter(cache))]
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': ENCODING_CACHE_VERSION, 'files': cache}, f, ensure_ascii=False)
+            os.replace(temp_path, ENCODING_CACHE_FILE)
+    except OSError:
+        pass
+
+def read_file_smart_encoding(file_path, encoding=None):
+    """智能检测文件编码并读取 - 不使用外部库
+    
+    encoding: 指定编码时直接按该编码解码，不做检测
+    """
     try:
         # 读取二进制数据
         with open(file_path, 'rb') as f:
             raw_data = f.read()
         
+        hint_key = os.path.abspath(file_path)
+        if encoding:
+            print(f"使用指定编码: {encoding}")
+            ENCODING_HINTS[hint_key] = (encoding, 0.0)
+            return raw_data.decode(encoding, errors='replace')
+        
+        # 文件指纹与缓存一致时直接沿用上次的判断
+        fingerprint = file_fingerprint(file_path, raw_data)
+        cached = load_encoding_cache().get(hint_key)
+        if cached and cached.get('fingerprint') == fingerprint:
+            print(f"沿用缓存的编码判断: {cached['encoding']} (质量得分: {cached['score']:.2f})")
+            ENCODING_HINTS[hint_key] = (cached['encoding'], cached['score'])
+            return raw_data.decode(cached['encoding'], errors='replace')
+        
+        # 开头不变（只在末尾追加了章节）时，缓存的编码作为上次的判断优先尝试
+        if cached and cached.get('fingerprint', [None] * 4)[2] == fingerprint[2] and hint_key not in ENCODING_HINTS:
+            ENCODING_HINTS[hint_key] = (cached['encoding'], cached['score'])
+        
         # 常见编码列表（按优先级排序）
         encodings_to_try = [
             'utf-8', 
@@ -83,32 +505,45 @@ def read_file_smart_encoding(file_path):
             'cp1252'
         ]
         
+        # 上次选中的编码排在最前，得分不低于上次即直接采用
+        hint_encoding, hint_score = ENCODING_HINTS.get(hint_key, (None, 0))
+        if hint_encoding in encodings_to_try:
+            encodings_to_try.remove(hint_encoding)
+            encodings_to_try.insert(0, hint_encoding)
+        
         best_content = None
         best_encoding = None
         best_score = 0
         
-        for encoding in encodings_to_try:
+        for candidate in encodings_to_try:
             try:
-                content = raw_data.decode(encoding, errors='replace')
+                content = raw_data.decode(candidate, errors='replace')
                 score = evaluate_encoding_quality(content)
                 
-                print(f"编码 {encoding}: 质量得分 {score:.2f}")
+                print(f"编码 {candidate}: 质量得分 {score:.2f}")
                 
                 if score > best_score:
                     best_score = score
                     best_content = content
-                    best_encoding = encoding
+                    best_encoding = candidate
                     
                 # 如果质量很好，直接使用
                 if score > 0.9:
                     break
+                
+                # 与上次判断一致，不再尝试其他编码
+                if candidate == hint_encoding and score >= hint_score - 0.05:
+                    break
                     
             except (UnicodeDecodeError, LookupError) as e:
-                print(f"编码 {encoding} 失败: {e}")
+                print(f"编码 {candidate} 失败: {e}")
                 continue
         
         if best_content is not None:
             print(f"选择最佳编码: {best_encoding} (质量得分: {best_score:.2f})")
+            ENCODING_HINTS[hint_key] = (best_encoding, best_score)
+            save_encoding_cache({hint_key: {'fingerprint': fingerprint, 'encoding': best_encoding,
+                                            'score': best_score}})
             return best_content
         else:
             # 如果所有编码都失败，使用替代模式
@@ -171,7 +606,9 @@ def extract_chapters(content):
     chapters = []
     
     # 清理内容，移除明显的乱码
-    content = clean_garbled_text(content)
+    with measure_stage('clean', content, parent='extract') as stage:
+        content = clean_garbled_text(content)
+        stage['out'] = content
     
     # 多种章节模式 - 更全面的匹配
     patterns = [
@@ -220,8 +657,7 @@ def extract_chapters(content):
                 print(f"标题模式找到 {len(matches)} 个匹配")
     
     if not all_matches:
-        print("使用段落分割创建章节")
-        return split_by_paragraphs(content)
+        return list(split_into_pages(content))
     
     # 去重并排序
     unique_matches = []
@@ -253,7 +689,9 @@ def extract_chapters(content):
             chapter_content = content[start_pos:end_pos]
             
             # 清理内容
-            clean_content = clean_html_content(chapter_content)
+            with measure_stage('clean', chapter_content, parent='extract') as stage:
+                clean_content = clean_html_content(chapter_content)
+                stage['out'] = clean_content
             
             # 如果标题为空，使用默认标题
             if not title_text.strip():
@@ -294,35 +732,65 @@ def extract_title_text(html_text):
     text = clean_garbled_text(text)
     return text
 
-def split_by_paragraphs(content, max_chapters=200):
-    """如果没有章节，按段落分割"""
-    print("使用段落分割创建伪章节")
-    
-    # 清理内容
-    content = clean_garbled_text(content)
-    
-    # 多种段落分割方式
-    paragraphs = []
-    
-    # 尝试按HTML段落分割
-    p_matches = list(re.finditer(r'<p[^>]*>(.*?)</p>', content, re.DOTALL))
-    if len(p_matches) > 10:
-        for match in p_matches:
-            text = clean_html_content(match.group(1))
-            if len(text.strip()) > 20:
-                paragraphs.append(text)
-    else:
-        # 按换行符分割
-        paragraphs = re.split(r'\n\s*\n', content)
-    
-    chapters = []
-    for i in range(min(len(paragraphs), max_chapters)):
-        clean_content = clean_html_content(paragraphs[i])
-        clean_content = clean_garbled_text(clean_content)
-        if len(clean_content.strip()) > 10:
-            chapters.append((i+1, f"第{i+1}段", clean_content))
-    
-    return chapters
+# 分页边界：段落结束、换行标签或空行（贪婪匹配取窗口内最后一个）
+LAST_PARAGRAPH_END_PATTERN = re.compile(r'.*(?:</p>|</div>|<br\s*/?>|\n\s*\n)', re.DOTALL | re.IGNORECASE)
+BODY_START_PATTERN = re.compile(r'<body[^>]*>', re.IGNORECASE)
+# 正文中的 <script>/<style>：分页时整体保留在同一页
+RAW_TEXT_START_PATTERN = re.compile(r'<(script|style)\b', re.IGNORECASE)
+
+def raw_text_safe_end(content, pos, end):
+    """切分点落在 <script>/<style> 元素内部时，改到元素之前（元素在页首时改到元素之后）
+
+    切开的元素在清理时去不掉，其中的代码会作为正文显示
+    """
+    last = None
+    for last in RAW_TEXT_START_PATTERN.finditer(content, pos, end):
+        pass
+    if last is None:
+        return end
+    close = re.compile(rf'</{last.group(1)}\s*>', re.IGNORECASE).search(content, last.end())
+    close_end = close.end() if close else len(content)
+    if close_end <= end:
+        return end
+    return last.start() if last.start() > pos else close_end
+
+def split_into_pages(content, page_size=30000):
+    """如果没有章节，把全文按页切成伪章节 - 生成器，不截断任何内容
+
+    每页不超过 page_size 个原始字符（<script>/<style> 元素不切开，可能超出），优先在段落边界切分，其次句子边界；
+    逐页清理，不复制整份内容。调用方取成列表：去重、区块分配和渲染都要用到完整的章节列表，
+    而各页正文最终都要写入页面，列表只多占清理后正文的一份；额外的工作内存只有当前一页
+    """
+    print("使用分页创建伪章节")
+    
+    # 跳过<head>部分（样式、脚本）
+    body_match = BODY_START_PATTERN.search(content)
+    pos = body_match.end() if body_match else 0
+    content_length = len(content)
+    page_num = 0
+    
+    while pos < content_length:
+        end = min(pos + page_size, content_length)
+        if end < content_length:
+            window_start = pos + page_size // 2
+            match = (LAST_PARAGRAPH_END_PATTERN.match(content, window_start, end)
+                     or LAST_SENTENCE_END_PATTERN.match(content, window_start, end))
+            if match:
+                end = match.end()
+            else:
+                # 没有边界时硬切，但不要切在标签中间
+                tag_start = content.rfind('<', window_start, end)
+                if tag_start > content.rfind('>', window_start, end):
+                    end = tag_start
+            end = raw_text_safe_end(content, pos, end)
+        
+        page_text = clean_garbled_text(content[pos:end])
+        pos = end
+        if not re.sub(r'<[^>]+>', '', page_text).strip():
+            continue
+        
+        page_num += 1
+        yield (page_num, f"第{page_num}页", clean_html_content(page_text))
 
 def clean_html_content(content):
     """清理HTML内容"""
@@ -330,8 +798,8 @@ def clean_html_content(content):
         return "内容为空"
     
     # 移除HTML标签但保留文本
-    clean_content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL)
-    clean_content = re.sub(r'<style[^>]*>.*?</style>', '', clean_content, flags=re.DOTALL)
+    clean_content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
+    clean_content = re.sub(r'<style[^>]*>.*?</style>', '', clean_content, flags=re.DOTALL | re.IGNORECASE)
     clean_content = re.sub(r'<[^>]+>', ' ', clean_content)
     
     # 合并空白字符
@@ -343,8 +811,177 @@ def clean_html_content(content):
     
     return clean_content
 
-def distribute_to_blocks(chapters, num_blocks=26):
-    """将章节分配到区块"""
+def minhash_signature(text, num_perm=64, shingle_size=5):
+    """计算文本的MinHash签名 - 单次哈希分桶（one permutation hashing），线性时间"""
+    text = re.sub(r'\s+', '', text)
+    if len(text) < shingle_size:
+        text = text.ljust(shingle_size)
+
+    # 每个shingle只哈希一次，按哈希值落入 num_perm 个桶，每桶保留最小值
+    # 用 blake2b 而不是内置 hash()：后者按进程随机化，每次运行签名不同，去重结果不可复现
+    shingles = {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+    signature = [None] * num_perm
+    blake2b = hashlib.blake2b
+    for shingle in shingles:
+        h = int.from_bytes(blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot = h % num_perm
+        value = h // num_perm
+        if signature[slot] is None or value < signature[slot]:
+            signature[slot] = value
+
+    # 空桶稠密化：借用右侧最近的非空桶，保证签名可比
+    filled = [i for i, v in enumerate(signature) if v is not None]
+    for i in range(num_perm):
+        if signature[i] is None:
+            j = next((k for k in filled if k > i), filled[0])
+            signature[i] = (signature[j], j - i)
+
+    return signature
+
+def dedupe_chapters(chapters, threshold=0.8, mode='merge', num_perm=64, bands=16, min_length=200):
+    """检测近似重复章节（转载、修正版）- MinHash + LSH 分桶
+
+    返回 (chapters, redirects)，redirects 为 {被合并章节号: 保留章节号}
+    短于 min_length 的章节（目录页、占位页）相似度不可靠，不参与检测
+    """
+    if len(chapters) < 2:
+        return chapters, {}
+
+    rows = num_perm // bands
+    signatures = [minhash_signature(content, num_perm) for _, _, content in chapters]
+    lengths = [len(content) for _, _, content in chapters]
+
+    # LSH：每个band的签名片段相同即为候选对
+    buckets = {}
+    for idx, sig in enumerate(signatures):
+        if lengths[idx] < min_length:
+            continue
+        for b in range(bands):
+            key = (b, tuple(sig[b * rows:(b + 1) * rows]))
+            buckets.setdefault(key, []).append(idx)
+
+    # 并查集合并相似章节，保留最早出现的一章
+    parent = list(range(len(chapters)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for a_pos, a in enumerate(members):
+            for b in members[a_pos + 1:]:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                # 长度差异过大不可能高度相似
+                if min(lengths[a], lengths[b]) < threshold * max(lengths[a], lengths[b]):
+                    continue
+                same = sum(1 for x, y in zip(signatures[a], signatures[b]) if x == y)
+                if same / num_perm >= threshold:
+                    root_a, root_b = find(a), find(b)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    redirects = {}
+    result = []
+    for idx, (chap_num, chap_title, chap_content) in enumerate(chapters):
+        root = find(idx)
+        if root == idx:
+            result.append((chap_num, chap_title, chap_content))
+            continue
+
+        kept_num = chapters[root][0]
+        if mode == 'flag':
+            result.append((chap_num, f"{chap_title}（疑似重复: 第{kept_num}章）", chap_content))
+        else:
+            redirects[chap_num] = kept_num
+            print(f"合并重复章节: 第{chap_num}章 -> 第{kept_num}章")
+
+    if mode == 'flag':
+        flagged = sum(1 for idx in range(len(chapters)) if find(idx) != idx)
+        print(f"标记疑似重复章节: {flagged} 个")
+    else:
+        print(f"合并重复章节: {len(redirects)} 个")
+
+    return result, redirects
+
+def size_balanced_boundaries(chapters, num_blocks):
+    """按清理后文本的UTF-8字节数计算区块边界 - 前缀和 + 二分查找
+
+    返回每个区块的结束下标（不含），保证每个区块至少一章且保持章节顺序
+    """
+    total_chapters = len(chapters)
+    prefix = list(accumulate(len(content.encode('utf-8')) for _, _, content in chapters))
+    total_size = prefix[-1]
+    
+    boundaries = []
+    prev_end = 0
+    for i in range(1, num_blocks):
+        target = total_size * i / num_blocks
+        k = bisect_left(prefix, target)
+        end_idx = k + 1
+        # 取累计大小更接近目标的一侧
+        if k >= 1 and target - prefix[k - 1] < prefix[k] - target:
+            end_idx = k
+        # 每个区块至少一章，并为后面的区块留出章节
+        end_idx = max(end_idx, prev_end + 1)
+        end_idx = min(end_idx, total_chapters - (num_blocks - i))
+        boundaries.append(end_idx)
+        prev_end = end_idx
+    
+    boundaries.append(total_chapters)
+    return boundaries
+
+def block_boundaries(chapters, num_blocks, balance='count'):
+    """计算区块边界（每个区块的结束下标，不含）"""
+    if balance == 'size':
+        return size_balanced_boundaries(chapters, num_blocks)
+    
+    base_chapters = len(chapters) // num_blocks
+    extra_chapters = len(chapters) % num_blocks
+    return list(accumulate(base_chapters + (1 if i < extra_chapters else 0)
+                           for i in range(num_blocks)))
+
+def build_block_tree(blocks, fanout=26, leaf_size=200, balance='count'):
+    """超大区块拆分为多级子区块: A -> A1..A26 -> A1-1..
+
+    返回 {区块字母: [(子区块ID, 章节列表, 子节点列表), ...]}，只包含需要拆分的区块；
+    每个叶子区块不超过 leaf_size 章，展开时只需渲染少量章节
+    """
+    def split(block_id, section_chapters, depth):
+        if len(section_chapters) <= leaf_size:
+            return []
+        
+        num_children = min(fanout, -(-len(section_chapters) // leaf_size))
+        if num_children < 2:
+            return []
+        children = []
+        start_idx = 0
+        for i, end_idx in enumerate(block_boundaries(section_chapters, num_children, balance)):
+            child_id = f"{block_id}{i + 1}" if depth == 0 else f"{block_id}-{i + 1}"
+            child_chapters = section_chapters[start_idx:end_idx]
+            children.append((child_id, child_chapters, split(child_id, child_chapters, depth + 1)))
+            start_idx = end_idx
+        return children
+    
+    tree = {}
+    for letter, section_chapters in blocks.items():
+        children = split(letter, section_chapters, 0)
+        if children:
+            tree[letter] = children
+            print(f"区块 {letter}: 拆分为 {len(children)} 个子区块")
+    return tree
+
+def distribute_to_blocks(chapters, num_blocks=26, balance='count'):
+    """将章节分配到区块
+
+    balance: 'count' 按章节数平均分配；'size' 按文本字节数平均分配
+    """
     total_chapters = len(chapters)
     blocks = {}
     
@@ -359,30 +996,43 @@ def distribute_to_blocks(chapters, num_blocks=26):
             print(f"区块 {letter}: 第{chapter[0]}章 (共1章)")
         return blocks
     
-    base_chapters = total_chapters // num_blocks
-    extra_chapters = total_chapters % num_blocks
+    boundaries = block_boundaries(chapters, num_blocks, balance)
     
     start_idx = 0
-    for i in range(num_blocks):
+    for i, end_idx in enumerate(boundaries):
         letter = chr(65 + i)  # A-Z
-        chunk_size = base_chapters
-        if i < extra_chapters:
-            chunk_size += 1
-        
-        end_idx = start_idx + chunk_size
-        if end_idx > total_chapters:
-            end_idx = total_chapters
         
         if start_idx < total_chapters:
             blocks[letter] = chapters[start_idx:end_idx]
             block_info = blocks[letter]
-            print(f"区块 {letter}: 第{block_info[0][0]}-第{block_info[-1][0]}章 (共{len(block_info)}章)")
+            if balance == 'size':
+                block_size = sum(len(content) for _, _, content in block_info)
+                print(f"区块 {letter}: 第{block_info[0][0]}-第{block_info[-1][0]}章 (共{len(block_info)}章, {block_size}字)")
+            else:
+                print(f"区块 {letter}: 第{block_info[0][0]}-第{block_info[-1][0]}章 (共{len(block_info)}章)")
             start_idx = end_idx
     
     return blocks
 
-def generate_search_html(blocks, total_chapters, original_filename):
-    """生成搜索HTML - 包含导航链接和锚点"""
+def generate_search_html(blocks, total_chapters, original_filename, redirects=None, block_tree=None, profile=None,
+                         assets=None, markup='full', minify=False):
+    """生成搜索HTML - 包含导航链接和锚点
+
+    redirects: {被合并章节号: 保留章节号}，为被合并的章节保留 #chap-N 锚点
+    block_tree: build_block_tree() 的结果，超大区块按多级子区块渲染
+    profile: 主题名、主题文件路径或 load_profile() 的结果，默认 default
+    assets: asset_hrefs() 的结果时引用外部样式和脚本，None 时内嵌
+    markup: 'compact' 时章节只输出标题和段落文本，其余由页面脚本按需生成（显示效果相同）
+    minify: 使用压缩过的样式和脚本
+    """
+    profile = load_profile(profile)
+    chapter_tag = profile['chapter_tag']
+    separator = profile['nav_separator']
+    
+    # 被合并章节的锚点挂到保留章节上
+    alias_anchors = {}
+    for old_num, kept_num in (redirects or {}).items():
+        alias_anchors.setdefault(kept_num, []).append(old_num)
     
     # 生成导航链接 - A-Z 区块导航
     nav_links = []
@@ -393,69 +1043,105 @@ def generate_search_html(blocks, total_chapters, original_filename):
             last_chap = blocks[letter][-1][0]
             nav_links.append(f'<a href="#block-{letter}" title="第{first_chap}-{last_chap}章">{letter}</a>')
     
-    # 添加顶部链接 | ->.
+    # 添加顶部链接
     nav_links.append('<a href="#top">顶部</a>')
-    navigation = '.'.join(nav_links) 
-    
-    # 内容区块
-    content_blocks = []
-    for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-        if letter in blocks and blocks[letter]:
-            section_chapters = blocks[letter]
+    navigation = separator.join(nav_links)
+    
+    def render_chapters(block_id, section_chapters):
+        """渲染叶子区块内的章节"""
+        chapters_html = ''
+        for chap_num, chap_title, chap_content in section_chapters:
+            # 为每个章节创建锚点
+            chapter_anchor = f"chap-{chap_num}"
+            with measure_stage('split', chap_content, parent='render') as stage:
+                paragraphs = list(smart_split(chap_content))
+                stage['out'] = paragraphs
             
-            block_html = f'''
-<div class="block" id="block-{letter}">
-    <h2 class="block-title" onclick="toggleBlock('{letter}')">
-        <span class="block-letter rainbow-text">{letter}</span>
-        <span class="block-range gradient-text">第{section_chapters[0][0]}-第{section_chapters[-1][0]}章</span>
-        <span class="block-count color-text-3">(共{len(section_chapters)}章)</span>
-        <span class="block-controls">
-            <span class="fold-icon color-text-4" id="icon-{letter}">▼</span>
-            <a href="#top" class="top-link color-text-5">↑顶部</a>
-        </span>
-    </h2>
-    <div class="block-content" id="content-{letter}">'''
-            
-            for chap_num, chap_title, chap_content in section_chapters:
-                # 为每个章节创建锚点
-                chapter_anchor = f"chap-{chap_num}"
-                paragraphs = smart_split(chap_content)
-                
-                block_html += f'''
-    <div class="chapter" id="{chapter_anchor}">
-        <h6 class="chapter-header" onclick="toggleChapter('{letter}-{chap_num}')">
+            if markup == 'compact':
+                # 段落颜色由 :nth-child 样式给出，标题栏链接和段落id由脚本生成
+                aliases = ''.join(f'<a id="chap-{old_num}" class="chapter-alias"></a>'
+                                  for old_num in alias_anchors.get(chap_num, []))
+                chapters_html += (f'\n<div class="chapter" id="{chapter_anchor}">{aliases}'
+                                  f'<{chapter_tag} class="chapter-header">'
+                                  f'<span class="chapter-title color-text-1">{escape_html(chap_title)}</span>'
+                                  f'</{chapter_tag}><div class="chapter-text"><p>'
+                                  + '</p><p>'.join(paragraphs) + '</p></div></div>')
+                continue
+
+            chapters_html += f'''
+    <div class="chapter" id="{chapter_anchor}">'''
+            for old_num in alias_anchors.get(chap_num, []):
+                chapters_html += f'<a id="chap-{old_num}" class="chapter-alias"></a>'
+            chapters_html += f'''
+        <{chapter_tag} class="chapter-header" onclick="toggleChapter('{block_id}-{chap_num}')">
             <span class="chapter-title color-text-1">{escape_html(chap_title)}</span>
             <span class="chapter-links">
-                <span class="fold-icon color-text-4" id="chapter-icon-{letter}-{chap_num}">▼</span>
+                <span class="fold-icon color-text-4" id="chapter-icon-{block_id}-{chap_num}">▼</span>
                 <a href="#{chapter_anchor}" class="anchor-link color-text-2" title="章节链接">#</a>
                 <a href="#top" class="top-link color-text-5">↑</a>
             </span>
-        </h6>
-        <div class="chapter-text" id="chapter-content-{letter}-{chap_num}">'''
-                
-                for i, para in enumerate(paragraphs):
-                    para_id = f'p_{letter}_{chap_num}_{i}'
-                    escaped_para = escape_html(para)
-                    # 为段落添加随机颜色类
-                    color_class = f'color-text-{(i % 6) + 1}'
-                    block_html += f'<p id="{para_id}" class="{color_class}" data-original="{escaped_para}">{para}</p>'
-                
-                block_html += '''
+        </{chapter_tag}>
+        <div class="chapter-text" id="chapter-content-{block_id}-{chap_num}">'''
+            
+            for i, para in enumerate(paragraphs):
+                para_id = f'p_{block_id}_{chap_num}_{i}'
+                escaped_para = escape_html(para)
+                # 为段落添加随机颜色类
+                color_class = f'color-text-{(i % 6) + 1}'
+                chapters_html += f'<p id="{para_id}" class="{color_class}" data-original="{escaped_para}">{para}</p>'
+            
+            chapters_html += '''
         </div>
     </div>'''
-            
-            block_html += '''
+        return chapters_html
+    
+    def render_block(block_id, section_chapters, children=None, nested=False):
+        """渲染区块；有子区块时渲染子导航和子区块（子区块默认折叠）"""
+        block_class = 'block subblock' if nested else 'block'
+        content_class = 'block-content collapsed' if nested else 'block-content'
+        icon_class = 'fold-icon color-text-4 collapsed' if nested else 'fold-icon color-text-4'
+        icon = '▶' if nested else '▼'
+        
+        block_html = f'''
+<div class="{block_class}" id="block-{block_id}">
+    <h2 class="block-title" onclick="toggleBlock('{block_id}')">
+        <span class="block-letter rainbow-text">{block_id}</span>
+        <span class="block-range gradient-text">第{section_chapters[0][0]}-第{section_chapters[-1][0]}章</span>
+        <span class="block-count color-text-3">(共{len(section_chapters)}章)</span>
+        <span class="block-controls">
+            <span class="{icon_class}" id="icon-{block_id}">{icon}</span>
+            <a href="#top" class="top-link color-text-5">↑顶部</a>
+        </span>
+    </h2>
+    <div class="{content_class}" id="content-{block_id}">'''
+        
+        if children:
+            sub_links = [f'<a href="#block-{child_id}" title="第{child_chapters[0][0]}-{child_chapters[-1][0]}章">{child_id}</a>'
+                         for child_id, child_chapters, _ in children]
+            block_html += f'''
+    <div class="sub-nav">{separator.join(sub_links)}</div>'''
+            for child_id, child_chapters, grandchildren in children:
+                block_html += render_block(child_id, child_chapters, grandchildren, nested=True)
+        else:
+            block_html += render_chapters(block_id, section_chapters)
+        
+        block_html += '''
     </div>
 </div>'''
-            
-            content_blocks.append(block_html)
+        return block_html
+    
+    # 内容区块
+    content_blocks = []
+    for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+        if letter in blocks and blocks[letter]:
+            content_blocks.append(render_block(letter, blocks[letter], (block_tree or {}).get(letter)))
     
     # 将所有内容区块连接成一个字符串
     content_html = ''.join(content_blocks)
     
     # 如果没有内容区块，创建默认内容
     if not content_html:
-        content_html = '''
+        content_html = f'''
 <div class="block" id="block-default">
     <h2 class="block-title" onclick="toggleBlock('default')">
         <span class="block-letter rainbow-text">全</span>
@@ -467,14 +1153,14 @@ def generate_search_html(blocks, total_chapters, original_filename):
     </h2>
     <div class="block-content" id="content-default">
         <div class="chapter" id="chap-1">
-            <h6 class="chapter-header" onclick="toggleChapter('default-1')">
+            <{chapter_tag} class="chapter-header" onclick="toggleChapter('default-1')">
                 <span class="chapter-title color-text-1">全文内容</span>
                 <span class="chapter-links">
                     <span class="fold-icon color-text-4" id="chapter-icon-default-1">▼</span>
                     <a href="#chap-1" class="anchor-link color-text-2" title="章节链接">#</a>
                     <a href="#top" class="top-link color-text-5">↑</a>
                 </span>
-            </h6>
+            </{chapter_tag}>
             <div class="chapter-text" id="chapter-content-default-1">
                 <p class="color-text-3">文件内容加载成功，请使用搜索功能查找特定内容。</p>
             </div>
@@ -482,12 +1168,351 @@ def generate_search_html(blocks, total_chapters, original_filename):
     </div>
 </div>'''
     
-    # HTML模板
-    html_template = f'''<!DOCTYPE html>
+    # HTML模板 - 静态部分按主题预编译，这里只填入本书的内容
+    return render_page(profile, assets, markup, minify, title=escape_html(original_filename),
+                       total_chapters=total_chapters, navigation=navigation, content_html=content_html)
+
+# 主题：模板中随主题变化的部分（标题标签、导航分隔符、字号、颜色、页头）
+# default 为 xds.py 原样式；h5-compact 为原 xds1.py 样式
+PROFILES = {
+    'default': {
+        'chapter_tag': 'h6',
+        'nav_separator': '.',
+        'body_font_size': '29px',
+        'font_small': '20px',
+        'font_normal': '28px',
+        'font_large': '34px',
+        'font_xlarge': '38px',
+        'mark_background': 'grey',
+        'header_background': 'linear-gradient(135deg, grey 0%, grey 100%)',
+        'header_padding': '2px 11px',
+        'header_min_height': '16px',
+        'header_icon_size': '12px',
+        'control_bar_min_height': '15px',
+        'button_hover_background': 'grey',
+        'nav_padding': '2px 4px',
+        'nav_margin': '4px -11px -6px -11px',
+        'nav_min_height': '11px',
+        'block_title_background': 'linear-gradient(135deg, #f8edeb, #f7931e)',
+        'chapter_header_color': 'grey',
+        'chapter_header_border': 'grey',
+        'chapter_header_hover': 'grey;',
+        # 页头标题被注释掉（不显示），只保留导航
+        'header_title': ('    <!div class="header-title">\n'
+                         '        <!span class="header-icon" /span>\n'
+                         '        <!span class="header-text"Rt【全文搜索版】 {title} | 总章节: {total_chapters} 章 /span>\n'
+                         '    <!/div>\n'),
+    },
+    'h5-compact': {
+        'chapter_tag': 'h5',
+        'nav_separator': '|',
+        'body_font_size': '26px',
+        'font_small': '20px',
+        'font_normal': '24px',
+        'font_large': '30px',
+        'font_xlarge': '34px',
+        'mark_background': '#ffeb3b',
+        'header_background': 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)',
+        'header_padding': '6px 15px',
+        'header_min_height': '26px',
+        'header_icon_size': '18px',
+        'control_bar_min_height': '25px',
+        'button_hover_background': '#5a6fd8',
+        'nav_padding': '2px 6px',
+        'nav_margin': '4px -15px -6px -15px',
+        'nav_min_height': '15px',
+        'block_title_background': 'linear-gradient(135deg, #ff6b35, #f7931e)',
+        'chapter_header_color': '#d4380d',
+        'chapter_header_border': '#ff6b35',
+        'chapter_header_hover': '#fff8f0;',
+        'header_title': ('    <div class="header-title">\n'
+                         '        <span class="header-icon">📚</span>\n'
+                         '        <span class="header-text">【全文搜索版】 {title} | 总章节: {total_chapters} 章</span>\n'
+                         '    </div>\n'),
+    },
+}
+
+# 每本书不同的内容，预编译时先用占位符代替
+PAGE_SLOTS = ('title', 'total_chapters', 'navigation', 'content_html')
+PAGE_SLOT_PATTERN = re.compile('\x00(\\w+)\x00')
+
+# 已编译的页面模板 {(主题, 是否外部资源): ([静态片段, 占位名, 静态片段, ...], 共享资源)}，同一进程内多本书复用
+COMPILED_PAGE_TEMPLATES = {}
+
+# 外部资源模式：样式和脚本抽出为共享文件，页面中替换为引用
+# 脚本中唯一随书变化的总章节数改由页面内的一行脚本提供
+PAGE_STYLE_PATTERN = re.compile(r'<style>\n(.*?)\n</style>', re.DOTALL)
+PAGE_SCRIPT_PATTERN = re.compile(r'<script>\n(.*?)\n</script>', re.DOTALL)
+EXTERNAL_STYLE_TAG = '<link rel="stylesheet" href="\x00css_href\x00">'
+EXTERNAL_SCRIPT_TAGS = ('<script>var xdsTotalChapters = \x00total_chapters\x00;</script>\n'
+                        '<script src="\x00js_href\x00"></script>')
+
+# 紧凑标记：段落颜色改用 :nth-child（与完整标记的 color-text-1..6 循环一致）
+# 只作用于没有 id 的章节正文，默认内容块仍按自身的颜色类显示
+COMPACT_STYLE = '''
+.chapter-text:not([id]) > p:nth-child(6n+1) { color: #E74C3C !important; }
+.chapter-text:not([id]) > p:nth-child(6n+2) { color: #2980B9 !important; }
+.chapter-text:not([id]) > p:nth-child(6n+3) { color: #27AE60 !important; }
+.chapter-text:not([id]) > p:nth-child(6n+4) { color: #8E44AD !important; }
+.chapter-text:not([id]) > p:nth-child(6n+5) { color: #E67E22 !important; }
+.chapter-text:not([id]) > p:nth-child(6n+6) { color: #16A085 !important; }'''
+
+# 紧凑标记的页面脚本：放在主脚本之前，加载时先补全章节标题栏，再由主脚本绑定锚点链接
+COMPACT_SCRIPT = '''// 紧凑标记：章节标题栏的折叠图标和链接在加载时生成，折叠用事件委托代替 onclick
+function toggleChapterHeader(header) {
+    const content = header.nextElementSibling;
+    const icon = header.querySelector('.fold-icon');
+
+    if (content.classList.contains('collapsed')) {
+        content.classList.remove('collapsed');
+        icon.classList.remove('collapsed');
+        icon.textContent = '▼';
+    } else {
+        content.classList.add('collapsed');
+        icon.classList.add('collapsed');
+        icon.textContent = '▶';
+    }
+}
+
+document.addEventListener('click', function(e) {
+    const header = e.target.closest('.chapter-header');
+    if (header && !header.hasAttribute('onclick')) {
+        toggleChapterHeader(header);
+    }
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    const links = document.createElement('span');
+    links.className = 'chapter-links';
+    links.innerHTML = '<span class="fold-icon color-text-4">▼</span>' +
+        '<a class="anchor-link color-text-2" title="章节链接">#</a>' +
+        '<a href="#top" class="top-link color-text-5">↑</a>';
+    document.querySelectorAll('.chapter-header:not([onclick])').forEach(header => {
+        const item = links.cloneNode(true);
+        item.children[1].setAttribute('href', '#' + header.parentElement.id);
+        header.appendChild(item);
+    });
+
+    // 段落链接 #p_区块_章节_序号：按需补上段落id
+    const match = /^p_.+_(\\d+)_(\\d+)$/.exec(decodeURIComponent(location.hash.slice(1)));
+    const chapter = match && document.getElementById('chap-' + match[1]);
+    const paragraph = chapter && chapter.querySelector('.chapter-text').children[match[2]];
+    if (paragraph && !paragraph.id) {
+        paragraph.id = decodeURIComponent(location.hash.slice(1));
+        revealSubBlocks(paragraph);
+        paragraph.scrollIntoView({ block: 'start' });
+    }
+});
+
+'''
+
+def load_profile(profile=None):
+    """取得主题：内置主题名、主题文件（JSON）路径或主题字典
+
+    主题文件可用 "base" 指定基础主题（默认 default），其余键覆盖基础主题的值
+    """
+    if isinstance(profile, dict):
+        return profile
+    profile = profile or 'default'
+    if profile in PROFILES:
+        return dict(PROFILES[profile], name=profile)
+    
+    with open(profile, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+    base = overrides.pop('base', 'default')
+    if base not in PROFILES:
+        raise ValueError(f"未知的基础主题: {base}")
+    unknown = set(overrides) - set(PROFILES[base])
+    if unknown:
+        raise ValueError(f"主题文件包含未知的键: {', '.join(sorted(unknown))}")
+    merged = dict(PROFILES[base], **overrides)
+    merged['name'] = os.path.abspath(profile)
+    return merged
+
+# CSS 词法单元：字符串、注释（未闭合的注释延续到末尾）、空白、其他
+CSS_TOKEN_PATTERN = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?(?:\*/|\Z))|(\s+)|([^"'/\s]+|/)''',
+                               re.DOTALL)
+# 这些字符两侧的空白可以去掉（':' 只去右侧，选择器里 ' :hover' 和 ':hover' 含义不同）
+CSS_TIGHT_BEFORE = set('{};,>')
+CSS_TIGHT_AFTER = set('{};,>:')
+
+def minify_css(text):
+    """压缩CSS：去掉注释和多余空白，以及 '}' 前多余的 ';'，字符串原样保留"""
+    out = []
+    pending_space = False
+    for string, comment, space, other in CSS_TOKEN_PATTERN.findall(text):
+        if comment or space:
+            pending_space = bool(out)
+            continue
+        token = string or other
+        if pending_space and out[-1][-1] not in CSS_TIGHT_AFTER and token[0] not in CSS_TIGHT_BEFORE:
+            out.append(' ')
+        if token[0] == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(token)
+        pending_space = False
+    return ''.join(out)
+
+# 这些字符两侧的空白在JS中可以去掉；'+'、'-'、'/'、'.' 等不在其中，避免 a - -b、a / /re/ 之类被拼在一起
+JS_TIGHT = set('{}()[];,:=<>?!&|')
+# 出现在这些字符或关键字之后的 '/' 是正则字面量而不是除号
+JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORD_PATTERN = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|new|delete|void|throw)$')
+JS_WORD_PATTERN = re.compile(r'[\w$\x00]+')
+
+def minify_js(text):
+    """压缩JS：去掉注释、缩进和空行，字符串、模板字符串和正则字面量原样保留
+
+    只删除不影响语义的空白；换行仅在 '{' ';' ',' 之后或 '}' ')' 之前去掉，其余保留，不依赖分号补全规则
+    """
+    out = []
+    i, n = 0, len(text)
+    pending = ''
+
+    def last_char():
+        return out[-1][-1] if out else ''
+
+    while i < n:
+        c = text[i]
+        if c.isspace() or (c == '/' and text[i + 1:i + 2] in ('/', '*')):
+            # 空白和注释：记下是否跨行，输出下一个词法单元时再决定保留什么
+            if c == '/' and text[i + 1] == '/':
+                end = text.find('\n', i)
+                i = n if end < 0 else end
+                continue
+            if c == '/':
+                end = text.find('*/', i + 2)
+                i = n if end < 0 else end + 2
+                pending = pending or ' '
+                continue
+            if c == '\n':
+                pending = '\n'
+            else:
+                pending = pending or ' '
+            i += 1
+            continue
+
+        if c in '"\'`':
+            # 字符串 / 模板字符串（模板中的 ${} 不含反引号）
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            token = text[i:j + 1]
+        elif c == '/' and (not out or last_char() in JS_REGEX_PRECEDERS
+                           or JS_REGEX_KEYWORD_PATTERN.search(out[-1])):
+            # 正则字面量：跳过转义和字符类中的 '/'，再带上标志
+            j, in_class = i + 1, False
+            while j < n and (in_class or text[j] != '/'):
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            token = text[i:j]
+            j -= 1
+        else:
+            match = JS_WORD_PATTERN.match(text, i)
+            j = match.end() - 1 if match else i
+            token = text[i:j + 1]
+
+        if pending and out:
+            prev = last_char()
+            if pending == '\n' and prev not in '{;,' and token[0] not in '})':
+                out.append('\n')
+            elif prev not in JS_TIGHT and token[0] not in JS_TIGHT:
+                out.append(' ')
+        pending = ''
+        out.append(token)
+        i = j + 1
+    return ''.join(out)
+
+def minify_page_assets(page):
+    """压缩页面中的 <style> 和 <script> 内容，返回 (页面, 节省的字节数)"""
+    before = len(page.encode('utf-8'))
+    page = PAGE_STYLE_PATTERN.sub(lambda m: '<style>\n' + minify_css(m.group(1)) + '\n</style>', page, 1)
+    page = PAGE_SCRIPT_PATTERN.sub(lambda m: '<script>\n' + minify_js(m.group(1)) + '\n</script>', page, 1)
+    return page, before - len(page.encode('utf-8'))
+
+def compile_page_template(profile, external=False, markup='full', minify=False):
+    """按主题填好模板的静态部分，拆成 [静态片段, 占位名, ...]（每个主题每个进程只做一次）
+
+    返回 (片段, 共享资源, 压缩节省的字节数)；external=True 时样式和脚本抽出为 {'css': 样式, 'js': 脚本}，
+    否则共享资源为 None。markup='compact' 时加入紧凑标记所需的样式和脚本，minify=True 时压缩样式和脚本
+    """
+    cache_key = (json.dumps(profile, sort_keys=True, ensure_ascii=False), external, markup, minify)
+    compiled = COMPILED_PAGE_TEMPLATES.get(cache_key)
+    if compiled is None:
+        slots = {slot: f'\x00{slot}\x00' for slot in PAGE_SLOTS}
+        values = dict(profile)
+        values['header_title'] = profile['header_title'].format(**slots)
+        page = PAGE_TEMPLATE.format(**values, **slots)
+        if markup == 'compact':
+            page = page.replace('\n</style>', COMPACT_STYLE + '\n</style>', 1)
+            page = page.replace('<script>\n', '<script>\n' + COMPACT_SCRIPT, 1)
+        saved = 0
+        if minify:
+            page, saved = minify_page_assets(page)
+        shared = None
+        if external:
+            style = PAGE_STYLE_PATTERN.search(page)
+            script = PAGE_SCRIPT_PATTERN.search(page)
+            shared = {
+                'css': style.group(1) + '\n',
+                'js': script.group(1).replace(slots['total_chapters'], 'xdsTotalChapters') + '\n',
+            }
+            page = (page[:style.start()] + EXTERNAL_STYLE_TAG + page[style.end():script.start()]
+                    + EXTERNAL_SCRIPT_TAGS + page[script.end():])
+        compiled = (PAGE_SLOT_PATTERN.split(page), shared, saved)
+        COMPILED_PAGE_TEMPLATES[cache_key] = compiled
+    return compiled
+
+def render_page(profile, assets=None, markup='full', minify=False, **slots):
+    """用预编译模板生成整页HTML；assets 为 asset_hrefs() 的结果时引用外部资源"""
+    pieces = compile_page_template(profile, assets is not None, markup, minify)[0]
+    if assets:
+        slots = dict(slots, css_href=assets['css'], js_href=assets['js'])
+    return ''.join(piece if i % 2 == 0 else str(slots[piece]) for i, piece in enumerate(pieces))
+
+def page_assets(profile, markup='full', minify=False):
+    """主题的共享资源 {'css': (文件名, 内容), 'js': (文件名, 内容)}，文件名带内容哈希"""
+    shared = compile_page_template(profile, True, markup, minify)[1]
+    assets = {}
+    for kind, text in shared.items():
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+        assets[kind] = (f"xds-{digest}.{kind}", text)
+    return assets
+
+def asset_hrefs(assets, assets_dir, page_dir):
+    """页面中引用共享资源的相对路径"""
+    rel_dir = os.path.relpath(os.path.abspath(assets_dir), page_dir).replace(os.sep, '/')
+    return {kind: f"{rel_dir}/{name}" for kind, (name, _) in assets.items()}
+
+def write_page_assets(assets, assets_dir):
+    """写入共享资源；文件名带内容哈希，已存在的不再重写
+
+    每次都检查文件是否存在（不记在进程内）：监视模式下资源目录被删后，下一次构建会重新写出
+    """
+    os.makedirs(assets_dir, exist_ok=True)
+    for name, text in assets.values():
+        path = os.path.abspath(os.path.join(assets_dir, name))
+        if os.path.exists(path):
+            continue
+        # 先写临时文件再改名，并行的批量进程不会读到写了一半的文件
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
-<title>全文搜索版 - {escape_html(original_filename)}</title>
+<title>全文搜索版 - {title}</title>
 <style>
 /* 重置样式 */
 * {{
@@ -501,25 +1526,25 @@ body {{
     line-height: 1.6;
     color: #333;
     background: #f8f9fa;
-    font-size: 29px; /* 26默认字体大小 */
+    font-size: {body_font_size}; /* 26默认字体大小 */
     transition: font-size 0.3s ease;
 }}
 
 /* 字体大小类 */
 .font-small {{
-    font-size: 20px !important;
+    font-size: {font_small} !important;
 }}
 
 .font-normal {{
-    font-size: 28px !important;
+    font-size: {font_normal} !important;
 }}
 
 .font-large {{
-    font-size: 34px !important;
+    font-size: {font_large} !important;
 }}
 
 .font-xlarge {{
-    font-size: 38px !important;
+    font-size: {font_xlarge} !important;
 }}
 
 /* 加粗文本类 */
@@ -557,23 +1582,40 @@ body {{
 
 /* 高亮样式 */
 .mark {{
-    background: grey !important;
+    background: {mark_background} !important;
     color: #000 !important;
     padding: 2px 4px;
     border-radius: 3px;
     box-shadow: 0 1px 2px rgba(0,0,0,0.2);
 }}
 
+/* 性能面板（Alt+P 或地址加 ?perf 打开） */
+.perf-panel {{
+    position: fixed;
+    right: 10px;
+    bottom: 10px;
+    z-index: 10000;
+    max-width: 90vw;
+    max-height: 50vh;
+    overflow: auto;
+    margin: 0;
+    padding: 8px 12px;
+    background: rgba(0, 0, 0, 0.85);
+    color: #7CFC00;
+    font: 12px/1.4 monospace;
+    border-radius: 6px;
+}}
+
 /* 顶部导航 - 单行紧凑设计#ffeb3b */
 .header {{
-    background: linear-gradient(135deg, grey 0%, grey 100%);
+    background: {header_background};
     color: white;
-    padding: 2px 11px; /* 6 15进一步减少内边距#667eea  #764ba2*/
+    padding: {header_padding}; /* 6 15进一步减少内边距#667eea  #764ba2*/
     position: sticky;
     top: 0;
     z-index: 1000;
     box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    min-height: 16px; /* 40进一步缩小高度 */
+    min-height: {header_min_height}; /* 40进一步缩小高度 */
     display: flex;
     align-items: center;
     justify-content: space-between;
@@ -588,7 +1630,7 @@ body {{
 }}
 
 .header-icon {{
-    font-size: 12px;  /* 18缩小字体 */
+    font-size: {header_icon_size};  /* 18缩小字体 */
 }}
 
 .header-text {{
@@ -612,7 +1654,7 @@ body {{
     align-items: center;
     flex-wrap: wrap;
     gap: 8px; /* 减少间距 */
-    min-height: 15px; /* 35进一步缩小高度 */
+    min-height: {control_bar_min_height}; /* 35进一步缩小高度 */
 }}
 
 .control-group {{
@@ -639,7 +1681,7 @@ body {{
 }}
 
 .control-btn:hover {{
-    background: grey;
+    background: {button_hover_background};
     transform: translateY(-1px);
 }}
 
@@ -700,11 +1742,11 @@ body {{
 /* 主导航 - 进一步缩小 */
 .main-nav {{
     background: rgba(255,255,255,0.1);
-    padding: 2px 4px; /* 4 10进一步减少内边距 */
-    margin: 4px -11px -6px -11px; /* 15调整外边距 */
+    padding: {nav_padding}; /* 4 10进一步减少内边距 */
+    margin: {nav_margin}; /* 15调整外边距 */
     backdrop-filter: blur(10px);
     text-align: center;
-    min-height: 11px; /* 25进一步缩小高度 */
+    min-height: {nav_min_height}; /* 25进一步缩小高度 */
 }}
 
 .main-nav a {{
@@ -782,7 +1824,7 @@ body {{
 }}
 
 .block-title {{
-    background: linear-gradient(135deg, #f8edeb, #f7931e);
+    background: {block_title_background};
     color: white;
     padding: 4px 8px; /*#ff6b35/f8!! 8 12进一步减少内边距 */
     margin: 0;
@@ -862,6 +1904,30 @@ body {{
     overflow: hidden;
 }}
 
+/* 多级子区块 - 折叠时不参与布局，展开即时 */
+.subblock {{
+    margin: 6px 8px;
+}}
+
+.subblock > .block-content.collapsed {{
+    display: none;
+}}
+
+.sub-nav {{
+    padding: 4px 8px;
+    text-align: center;
+    border-bottom: 1px solid #f0f0f0;
+}}
+
+.sub-nav a {{
+    color: #667eea;
+    text-decoration: none;
+    margin: 0 3px;
+    padding: 2px 3px;
+    display: inline-block;
+    font-size: 11px;
+}}
+
 /* 章节样式 - 进一步缩小 */
 .chapter {{
     border-bottom: 1px solid #f0f0f0;
@@ -873,12 +1939,12 @@ body {{
 }}
 
 .chapter-header {{
-    color: grey;
+    color: {chapter_header_color};
     font-size: 16px; /* #d4380d缩小字体 */
     font-weight: bold;
     margin: 0;
     padding: 10px 15px; /* 进一步减少内边距 */
-    border-bottom: 1px solid grey; /* #ff6b35减小边框 */
+    border-bottom: 1px solid {chapter_header_border}; /* #ff6b35减小边框 */
     display: flex;
     align-items: center;
     justify-content: space-between;
@@ -890,7 +1956,7 @@ body {{
 }}
 
 .chapter-header:hover {{
-    background: grey; /* #fff8f0;* /
+    background: {chapter_header_hover}
 }}
 
 .chapter-title {{
@@ -998,11 +2064,7 @@ body {{
 </head>
 <body>
 <div class="header" id="top">
-    <!div class="header-title">
-        <!span class="header-icon" /span>
-        <!span class="header-text"Rt【全文搜索版】 {escape_html(original_filename)} | 总章节: {total_chapters} 章 /span>
-    <!/div>
-    <div class="main-nav">
+{header_title}    <div class="main-nav">
         {navigation}
     </div>
 </div>
@@ -1079,6 +2141,11 @@ function setBoldText(style) {{
 
 // 折叠展开功能
 function toggleBlock(blockId) {{
+    flipBlock(blockId);
+}}
+
+// 切换区块的折叠状态（不经过性能计时，供搜索和跳转展开子区块时使用）
+function flipBlock(blockId) {{
     const content = document.getElementById(`content-${{blockId}}`);
     const icon = document.getElementById(`icon-${{blockId}}`);
     
@@ -1108,6 +2175,18 @@ function toggleChapter(chapterId) {{
     }}
 }}
 
+// 展开目标所在的各级子区块（子区块默认折叠）
+function revealSubBlocks(el) {{
+    let block = el.closest('.subblock');
+    while (block) {{
+        const content = block.querySelector(':scope > .block-content');
+        if (content && content.classList.contains('collapsed')) {{
+            flipBlock(block.id.slice('block-'.length));
+        }}
+        block = block.parentElement.closest('.subblock');
+    }}
+}}
+
 // 批量控制函数
 function expandAll() {{
     document.querySelectorAll('.block-content').forEach(el => {{
@@ -1181,23 +2260,95 @@ function toggleAllChapters() {{
     }});
 }}
 
+// 搜索语料：首次搜索时把全部段落文本连成一个字符串，段落起点记在 Uint32Array 中
+// 之后每次搜索只在这个字符串上查找，只有需要高亮的段落才访问DOM
+let searchCorpus = null;
+let highlightedParagraphs = [];
+
+function buildSearchCorpus() {{
+    const paragraphs = document.querySelectorAll('.chapter-text p');
+    const starts = new Uint32Array(paragraphs.length + 1);
+    const texts = new Array(paragraphs.length);
+    let length = 0;
+    paragraphs.forEach((p, i) => {{
+        starts[i] = length;
+        texts[i] = p.textContent || p.innerText;
+        length += texts[i].length + 1;
+    }});
+    starts[paragraphs.length] = length;
+    
+    // 段落之间用 \\u0000 分隔，匹配不会跨段落
+    return {{ text: texts.join('\\u0000'), starts: starts, paragraphs: paragraphs }};
+}}
+
+// 包含 query 的段落序号（升序），每个段落只计一次
+function findParagraphs(corpus, query) {{
+    const found = [];
+    const starts = corpus.starts;
+    let pos = corpus.text.indexOf(query);
+    while (pos !== -1) {{
+        // 二分查找命中位置所在的段落
+        let lo = 0, hi = starts.length - 2;
+        while (lo < hi) {{
+            const mid = (lo + hi + 1) >>> 1;
+            if (starts[mid] <= pos) {{
+                lo = mid;
+            }} else {{
+                hi = mid - 1;
+            }}
+        }}
+        found.push(lo);
+        pos = corpus.text.indexOf(query, starts[lo + 1]);
+    }}
+    return found;
+}}
+
+// 最近查询的结果（LRU）：退格时直接取用；新查询包含某个已缓存的查询时（如 张 → 张三），
+// 命中段落必然在其结果之中，只需在最少的那组结果里筛选
+const SEARCH_CACHE_SIZE = 32;
+const searchCache = new Map();
+
+function searchParagraphs(corpus, query) {{
+    let found = searchCache.get(query);
+    if (found) {{
+        searchCache.delete(query);
+    }} else {{
+        let candidates = null;
+        searchCache.forEach((hits, cached) => {{
+            if (query.includes(cached) && (!candidates || hits.length < candidates.length)) {{
+                candidates = hits;
+            }}
+        }});
+        found = candidates
+            ? candidates.filter(index => corpus.text.slice(corpus.starts[index], corpus.starts[index + 1] - 1).includes(query))
+            : findParagraphs(corpus, query);
+    }}
+    searchCache.set(query, found);
+    if (searchCache.size > SEARCH_CACHE_SIZE) {{
+        searchCache.delete(searchCache.keys().next().value);
+    }}
+    return found;
+}}
+
 // 增强搜索功能
 function performSearch() {{
     const query = document.getElementById('searchInput').value.trim();
     const results = document.getElementById('searchStats');
-    const allParagraphs = document.querySelectorAll('.chapter-text p');
     
     let foundCount = 0;
     let foundChapters = new Set();
     
-    // 重置所有高亮
-    allParagraphs.forEach(p => {{
+    // 重置上次的高亮
+    let phase = perfStart('搜索-重置');
+    highlightedParagraphs.forEach(p => {{
         const original = p.getAttribute('data-original');
         if (original) {{
             p.innerHTML = original;
         }}
         p.closest('.chapter').style.backgroundColor = '';
     }});
+    perfEnd(phase, highlightedParagraphs.length + '段');
+    highlightedParagraphs = [];
     
     if (!query) {{
         results.innerHTML = '';
@@ -1205,38 +2356,52 @@ function performSearch() {{
         return;
     }}
     
-    // 搜索每个段落
-    allParagraphs.forEach(p => {{
-        const text = p.textContent || p.innerText;
-        if (text.includes(query)) {{
-            foundCount++;
-            const chapter = p.closest('.chapter');
-            if (chapter) {{
-                foundChapters.add(chapter.id);
-                // 自动展开包含搜索结果的章节
-                const chapterContent = chapter.querySelector('.chapter-text');
-                const chapterIcon = chapter.querySelector('.chapter-header .fold-icon');
-                if (chapterContent && chapterContent.classList.contains('collapsed')) {{
-                    chapterContent.classList.remove('collapsed');
-                    if (chapterIcon) {{
-                        chapterIcon.classList.remove('collapsed');
-                        chapterIcon.textContent = '▼';
-                    }}
+    phase = perfStart('搜索-查找');
+    if (!searchCorpus) {{
+        searchCorpus = buildSearchCorpus();
+    }}
+    const found = searchParagraphs(searchCorpus, query);
+    perfEnd(phase, '"' + query + '" ' + found.length + '段');
+    
+    // 只访问命中的段落
+    phase = perfStart('搜索-高亮');
+    found.forEach(index => {{
+        const p = searchCorpus.paragraphs[index];
+        const text = searchCorpus.text.slice(searchCorpus.starts[index], searchCorpus.starts[index + 1] - 1);
+        foundCount++;
+        highlightedParagraphs.push(p);
+        const chapter = p.closest('.chapter');
+        if (chapter) {{
+            foundChapters.add(chapter.id);
+            revealSubBlocks(chapter);
+            // 自动展开包含搜索结果的章节
+            const chapterContent = chapter.querySelector('.chapter-text');
+            const chapterIcon = chapter.querySelector('.chapter-header .fold-icon');
+            if (chapterContent && chapterContent.classList.contains('collapsed')) {{
+                chapterContent.classList.remove('collapsed');
+                if (chapterIcon) {{
+                    chapterIcon.classList.remove('collapsed');
+                    chapterIcon.textContent = '▼';
                 }}
             }}
-            
-            // 高亮匹配文本
-            const newHTML = text.replace(new RegExp(escapeRegExp(query), 'g'), 
-                '<mark class="mark">' + query + '</mark>');
-            p.innerHTML = newHTML;
-            
-            // 高亮包含匹配的章节
-            if (chapter) {{
-                chapter.style.backgroundColor = '#f8ffd6';
-            }}
+        }}
+        
+        // 高亮匹配文本（紧凑标记不输出 data-original，首次高亮前保存原文）
+        if (!p.hasAttribute('data-original')) {{
+            p.setAttribute('data-original', p.innerHTML);
+        }}
+        const newHTML = text.replace(new RegExp(escapeRegExp(query), 'g'),
+            '<mark class="mark">' + query + '</mark>');
+        p.innerHTML = newHTML;
+        
+        // 高亮包含匹配的章节
+        if (chapter) {{
+            chapter.style.backgroundColor = '#f8ffd6';
         }}
     }});
-    
+    perfEnd(phase, foundChapters.size + '章');
+    perfUntilPaint(phase, '搜索-至绘制');
+
     if (foundCount > 0) {{
         results.innerHTML = '✅ 搜索 "<b>' + query + '</b>" 找到 <b>' + foundCount + '</b> 个匹配，分布在 <b>' + foundChapters.size + '</b> 个章节中';
         results.style.display = 'block';
@@ -1260,6 +2425,7 @@ document.addEventListener('DOMContentLoaded', function() {{
             e.preventDefault();
             const target = document.querySelector(this.getAttribute('href'));
             if (target) {{
+                revealSubBlocks(target);
                 target.scrollIntoView({{
                     behavior: 'smooth',
                     block: 'start'
@@ -1268,8 +2434,132 @@ document.addEventListener('DOMContentLoaded', function() {{
         }});
     }});
     
+    // 直接打开 #chap-N 等链接时，先展开所在子区块
+    if (location.hash.length > 1) {{
+        const target = document.getElementById(decodeURIComponent(location.hash.slice(1)));
+        if (target && target.closest('.subblock')) {{
+            revealSubBlocks(target);
+            target.scrollIntoView({{ block: 'start' }});
+        }}
+    }}
+    
     console.log('页面加载完成！搜索功能已就绪。');
     console.log('总章节数:', {total_chapters});
+    
+    perfEnd({{ start: 0 }}, '', '页面-可交互');
+    if (new URLSearchParams(location.search).has('perf')) {{
+        togglePerfPanel();
+    }}
+}});
+
+window.addEventListener('load', function() {{
+    perfEnd({{ start: 0 }}, '', '页面-加载完成');
+}});
+
+// 性能记录：页面加载、每次搜索的各阶段、折叠展开的耗时，同时写入 performance 时间线
+// 读者按 Alt+P（或在地址后加 ?perf）打开面板，可把内容复制到问题反馈中
+const PERF_LOG_SIZE = 100;
+const perfLog = [];
+
+// measure 直接用记录的起止时间，不留 mark，同名计时嵌套或交错也互不影响；
+// measure 记录后即清除（开发者工具录制时仍能看到），长时间阅读不会在 performance 中无限累积
+function perfStart(name) {{
+    return {{ name: name, start: performance.now() }};
+}}
+
+function perfEnd(span, detail, label) {{
+    const name = label || span.name;
+    const end = performance.now();
+    performance.measure(name, {{ start: span.start, end: end }});
+    performance.clearMeasures(name);
+    perfLog.push({{ name: name, duration: end - span.start, detail: detail || '' }});
+    if (perfLog.length > PERF_LOG_SIZE) {{
+        perfLog.shift();
+    }}
+    schedulePerfPanel();
+}}
+
+// 记录到下一次绘制之后（含样式计算和布局）
+function perfUntilPaint(span, label) {{
+    requestAnimationFrame(() => setTimeout(() => perfEnd(span, '', label), 0));
+}}
+
+// 折叠/展开操作计时：包装全局的折叠函数（页面中的 onclick 也会调用包装后的函数）
+// 只计读者直接触发的最外层操作，折叠函数内部再调用的不另计
+let perfFoldDepth = 0;
+['toggleBlock', 'toggleChapter', 'toggleChapterHeader', 'expandAll', 'collapseAll',
+ 'toggleAllBlocks', 'toggleAllChapters'].forEach(name => {{
+    const fold = window[name];
+    if (typeof fold !== 'function') {{
+        return;
+    }}
+    window[name] = function() {{
+        if (perfFoldDepth > 0) {{
+            return fold.apply(this, arguments);
+        }}
+        const span = perfStart('折叠-' + name);
+        perfFoldDepth++;
+        try {{
+            return fold.apply(this, arguments);
+        }} finally {{
+            perfFoldDepth--;
+            perfEnd(span);
+            perfUntilPaint(span, '折叠-' + name + '-至绘制');
+        }}
+    }};
+}});
+
+// 面板刷新要遍历整个 DOM，每帧最多刷新一次
+let perfPanelFrame = 0;
+function schedulePerfPanel() {{
+    if (perfPanelFrame || !document.getElementById('perfPanel')) {{
+        return;
+    }}
+    perfPanelFrame = requestAnimationFrame(() => {{
+        perfPanelFrame = 0;
+        updatePerfPanel();
+    }});
+}}
+
+function updatePerfPanel() {{
+    const panel = document.getElementById('perfPanel');
+    if (!panel) {{
+        return;
+    }}
+    const lines = [
+        '性能记录（Alt+P 关闭）' + navigator.userAgent,
+        'DOM节点: ' + document.getElementsByTagName('*').length +
+            '  段落: ' + document.querySelectorAll('.chapter-text p').length +
+            '  高亮段落: ' + highlightedParagraphs.length +
+            '  总章节: ' + {total_chapters},
+    ];
+    if (performance.memory) {{
+        lines.push('JS堆: ' + (performance.memory.usedJSHeapSize / 1048576).toFixed(1) + ' MB');
+    }}
+    perfLog.forEach(entry => {{
+        lines.push(entry.duration.toFixed(1).padStart(9) + ' ms  ' + entry.name + (entry.detail ? '  ' + entry.detail : ''));
+    }});
+    panel.textContent = lines.join('\\n');
+}}
+
+function togglePerfPanel() {{
+    let panel = document.getElementById('perfPanel');
+    if (panel) {{
+        panel.remove();
+        return;
+    }}
+    panel = document.createElement('pre');
+    panel.id = 'perfPanel';
+    panel.className = 'perf-panel';
+    document.body.appendChild(panel);
+    updatePerfPanel();
+}}
+
+document.addEventListener('keydown', function(e) {{
+    if (e.altKey && e.code === 'KeyP') {{
+        e.preventDefault();
+        togglePerfPanel();
+    }}
 }});
 
 // 实时搜索防抖
@@ -1283,8 +2573,6 @@ function performSearchWithDebounce() {{
 </script>
 </body>
 </html>'''
-    
-    return html_template
 
 def escape_html(text):
     """转义HTML特殊字符"""
@@ -1296,45 +2584,561 @@ def escape_html(text):
                .replace('"', '&quot;')
                .replace("'", '&#39;'))
 
+# 句末标点（连同其后的引号、括号）视为句子边界
+SENTENCE_END_PATTERN = re.compile(r'[。！？!?]+[”’」』"\')）]*')
+# 窗口内最后一个句子边界：贪婪匹配后回溯，只需一次C层调用
+LAST_SENTENCE_END_PATTERN = re.compile(r'.*[。！？!?]', re.DOTALL)
+SENTENCE_CLOSER_PATTERN = re.compile(r'[。！？!?]*[”’」』"\')）]*')
+
 def smart_split(text, max_length=500):
-    """智能文本分割"""
+    """智能文本分割 - 生成器，按句子边界切出不超过 max_length 的原文段落（保留原标点）
+
+    句末的引号、括号与句子同段；只有单句（连同其后的引号）超过 max_length 时，该句单独成段并超出
+    """
     if not text or len(text.strip()) == 0:
-        return ["内容为空"]
+        yield "内容为空"
+        return
     
     text = text.strip()
-    if len(text) <= max_length:
-        return [text]
-    
-    # 按句子分割
-    sentences = re.split(r'[。！？!?]', text)
-    paragraphs = []
-    current_para = []
-    current_length = 0
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if sentence:
-            sentence_length = len(sentence)
-            if current_length + sentence_length > max_length and current_para:
-                para_text = '。'.join(current_para) + '。'
-                paragraphs.append(para_text)
-                current_para = [sentence]
-                current_length = sentence_length
+    text_length = len(text)
+    if text_length <= max_length:
+        yield text
+        return
+    
+    pos = 0
+    while text_length - pos > max_length:
+        limit = pos + max_length
+        end = None
+        while end is None:
+            match = LAST_SENTENCE_END_PATTERN.match(text, pos, limit)
+            if not match:
+                break
+            # 把紧随其后的标点、引号并入本段；并入后超长时退到前一个句子边界
+            closer_end = SENTENCE_CLOSER_PATTERN.match(text, match.end()).end()
+            if closer_end - pos <= max_length:
+                end = closer_end
             else:
-                current_para.append(sentence)
-                current_length += sentence_length
+                limit = match.end() - 1
+        if end is None:
+            # 单句超长：整句单独成段
+            match = SENTENCE_END_PATTERN.search(text, pos)
+            if not match:
+                break
+            end = match.end()
+        
+        if end >= text_length:
+            break
+        yield text[pos:end].strip()
+        pos = end
+    
+    tail = text[pos:].strip()
+    if tail:
+        yield tail
+
+# 批量模式：记录每个输出文件的构建参数，参数不变且输出比输入新时跳过
+BUILD_MANIFEST = '.xds-build.json'
+
+def is_source_file(path):
+    """是否为待处理的源文件（排除已生成的 _search.html）"""
+    return path.endswith(('.htm', '.html')) and not path.endswith('_search.html')
+
+def collect_input_files(targets):
+    """展开目录和通配符为输入文件列表（排除已生成的 _search.html）"""
+    files = []
+    for target in targets:
+        if os.path.isdir(target):
+            matches = sorted(glob.glob(os.path.join(target, '*.htm')) +
+                             glob.glob(os.path.join(target, '*.html')))
+        else:
+            matches = sorted(glob.glob(target)) or [target]
+        for path in matches:
+            if not is_source_file(path) or path in files:
+                continue
+            files.append(path)
+    return files
+
+def settings_signature(options):
+    """构建参数签名（主题文件按内容计入，修改主题文件后会重新生成）"""
+    profile = options.get('profile')
+    if profile and profile not in PROFILES:
+        try:
+            with open(profile, 'rb') as f:
+                options = dict(options, profile=hashlib.sha1(f.read()).hexdigest())
+        except OSError:
+            pass
+    encoded = json.dumps(options, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+def load_build_manifest(output_dir):
+    """读取输出目录的构建记录"""
+    try:
+        with open(os.path.join(output_dir, BUILD_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_build_manifest(output_dir, manifest):
+    """写入输出目录的构建记录"""
+    path = os.path.join(output_dir, BUILD_MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def is_up_to_date(input_file, output_file, signature, manifest):
+    """输出文件比输入新，且用相同参数构建"""
+    if not os.path.exists(output_file):
+        return False
+    record = manifest.get(os.path.basename(output_file))
+    if not record or record.get('settings') != signature:
+        return False
+    return os.path.getmtime(output_file) >= os.path.getmtime(input_file)
+
+def batch_output_file(input_file, output_dir=None):
+    """批量/监视模式下的输出路径"""
+    target_dir = output_dir or os.path.dirname(input_file) or '.'
+    return os.path.join(target_dir, Path(input_file).stem + "_search.html")
+
+def output_collisions(input_files, output_dir=None):
+    """输出文件与前面的输入相同的输入文件 {输入文件: 先占用该输出的输入文件}
+
+    输出只取文件名主干，同一目录下的 a.htm 和 a.html（或 -o 汇总时不同目录下的同名书）会写到同一个页面
+    """
+    owners, collisions = {}, {}
+    for input_file in input_files:
+        output_key = os.path.normcase(os.path.abspath(batch_output_file(input_file, output_dir)))
+        if output_key in owners:
+            collisions[input_file] = owners[output_key]
+        else:
+            owners[output_key] = input_file
+    return collisions
+
+def record_build(manifest, input_file, output_file, signature, result):
+    """在构建记录中登记一次成功的构建"""
+    manifest[os.path.basename(output_file)] = {
+        'source': os.path.abspath(input_file),
+        'settings': signature,
+        'chapters': result['chapters'],
+    }
+
+def batch_worker(input_file, output_file, options, encoding_hints=None, metrics_json=None):
+    """批量模式子进程：静默处理单个文件，返回结果和日志"""
+    # 子进程常驻时保留编码判断，父进程也可以把已知判断传进来
+    ENCODING_HINTS.update(encoding_hints or {})
+    log = io.StringIO()
+    start_time = time.time()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = process_large_html_file(input_file, output_file, metrics_json=metrics_json, **options)
+    except Exception as e:
+        log.write(f"处理时出错: {e}\n")
+        result = None
+    return result, time.time() - start_time, log.getvalue()
+
+def process_batch(targets, options, output_dir=None, jobs=None, force=False, metrics_dir=None):
+    """批量处理目录/通配符下的所有文件 - 进程池并行，跳过已是最新的输出
+
+    metrics_dir: 每个文件的分阶段统计写入该目录下的 <文件名>.metrics.json
+    """
+    input_files = collect_input_files(targets)
+    if not input_files:
+        print("未找到输入文件")
+        return []
+    
+    signature = settings_signature(options)
+    manifests = {}
+    rows = []
+    pending = {}
+    minified_bytes = 0
+    collisions = output_collisions(input_files, output_dir)
+    
+    print(f"批量处理: {len(input_files)} 个文件")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for input_file in input_files:
+            output_file = batch_output_file(input_file, output_dir)
+            if input_file in collisions:
+                print(f"失败: {input_file} 与 {collisions[input_file]} 的输出文件相同 ({output_file})，请改名")
+                rows.append([input_file, '失败', 0.0, os.path.getsize(input_file), 0, 0])
+                continue
+            target_dir = os.path.dirname(output_file)
+            manifest = manifests.setdefault(target_dir, load_build_manifest(target_dir))
+            
+            if not force and is_up_to_date(input_file, output_file, signature, manifest):
+                record = manifest[os.path.basename(output_file)]
+                rows.append([input_file, '跳过', 0.0, os.path.getsize(input_file),
+                             os.path.getsize(output_file), record.get('chapters', 0)])
+                continue
+            
+            os.makedirs(target_dir, exist_ok=True)
+            metrics_json = None
+            if metrics_dir:
+                os.makedirs(metrics_dir, exist_ok=True)
+                metrics_json = os.path.join(metrics_dir, Path(input_file).stem + '.metrics.json')
+            future = executor.submit(batch_worker, input_file, output_file, options, None, metrics_json)
+            pending[future] = (input_file, output_file, target_dir)
+        
+        for future in as_completed(pending):
+            input_file, output_file, target_dir = pending[future]
+            result, elapsed, log = future.result()
+            input_size = os.path.getsize(input_file)
+            if result is None:
+                print(f"失败: {input_file}")
+                print(log.strip().splitlines()[-1] if log.strip() else "")
+                rows.append([input_file, '失败', elapsed, input_size, 0, 0])
+                continue
+            
+            record_build(manifests[target_dir], input_file, output_file, signature, result)
+            minified_bytes += result.get('minified_bytes', 0)
+            print(f"完成: {input_file} ({elapsed:.1f} 秒)")
+            rows.append([input_file, '生成', elapsed, input_size,
+                         result['output_size'], result['chapters']])
+    
+    for target_dir, manifest in manifests.items():
+        save_build_manifest(target_dir, manifest)
+    
+    print_batch_summary(rows)
+    if minified_bytes:
+        print(f"样式/脚本压缩: 共节省 {minified_bytes / 1024:.1f} KB")
+    return rows
+
+def print_batch_summary(rows):
+    """打印批量处理汇总表"""
+    rows = sorted(rows, key=lambda row: row[0])
+    name_width = max([len(row[0]) for row in rows] + [4])
+    print()
+    print(f"{'文件':<{name_width}}  状态  {'耗时(秒)':>8}  {'输入(MB)':>9}  {'输出(KB)':>9}  {'章节':>6}")
+    for name, status, elapsed, input_size, output_size, chapters in rows:
+        print(f"{name:<{name_width}}  {status}  {elapsed:>10.1f}  {input_size / (1024*1024):>10.2f}  "
+              f"{output_size / 1024:>10.1f}  {chapters:>8}")
+    
+    built = sum(1 for row in rows if row[1] == '生成')
+    skipped = sum(1 for row in rows if row[1] == '跳过')
+    failed = sum(1 for row in rows if row[1] == '失败')
+    total_time = sum(row[2] for row in rows)
+    print(f"合计: 生成 {built} 个, 跳过 {skipped} 个, 失败 {failed} 个, 累计处理时间 {total_time:.1f} 秒")
+
+# inotify 常量（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_MOVED_FROM = 0x00000040
+IN_DELETE = 0x00000200
+
+def open_inotify(directories):
+    """通过 ctypes 打开 inotify 监视目录 - 仅Linux，失败返回 None"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+        if fd < 0:
+            return None
+        watches = {}
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MOVED_FROM | IN_DELETE
+        for directory in directories:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd >= 0:
+                watches[wd] = directory
+        return fd, watches
+    except (OSError, AttributeError, TypeError):
+        return None
+
+def read_inotify_events(fd, watches, timeout):
+    """等待 inotify 事件，返回有变化的文件路径集合"""
+    changed = set()
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return changed
+    try:
+        data = os.read(fd, 65536)
+    except BlockingIOError:
+        return changed
+    
+    offset = 0
+    header_size = struct.calcsize('iIII')
+    while offset + header_size <= len(data):
+        wd, _mask, _cookie, name_length = struct.unpack_from('iIII', data, offset)
+        name = data[offset + header_size:offset + header_size + name_length].rstrip(b'\0')
+        offset += header_size + name_length
+        if wd in watches and name:
+            changed.add(os.path.join(watches[wd], os.fsdecode(name)))
+    return changed
+
+def scan_directories(directories):
+    """轮询扫描: {文件路径: (修改时间, 大小)}"""
+    snapshot = {}
+    for path in collect_input_files(directories):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def watch_directories(directories, options, output_dir=None, jobs=2, interval=1.0,
+                      debounce=2.0, use_inotify=False):
+    """监视目录，源文件变化后重新生成 - 防抖合并连续写入，常驻进程池并行处理
+
+    进程池常驻，子进程保留已编译的正则和编码判断；父进程记录每本书的编码判断并传给子进程
+    """
+    signature = settings_signature(options)
+    manifests = {}
+    encoding_hints = {}
+    snapshot = scan_directories(directories)
+    pending = {}    # 文件 -> 最近一次变化时间
+    running = {}    # future -> (输入文件, 输出文件)
+    
+    # 启动时先补齐已过期的输出
+    for input_file in snapshot:
+        output_file = batch_output_file(input_file, output_dir)
+        manifest = manifests.setdefault(os.path.dirname(output_file),
+                                        load_build_manifest(os.path.dirname(output_file)))
+        if not is_up_to_date(input_file, output_file, signature, manifest):
+            pending[input_file] = 0.0
+    
+    inotify = open_inotify(directories) if use_inotify else None
+    if use_inotify and inotify is None:
+        print("inotify 不可用，改用轮询")
+    print(f"监视中: {', '.join(directories)} ({'inotify' if inotify else f'每 {interval} 秒轮询'}, "
+          f"防抖 {debounce} 秒, {jobs} 个进程)，按 Ctrl+C 退出")
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        try:
+            while True:
+                # 1. 发现变化
+                now = time.time()
+                if inotify:
+                    changed = read_inotify_events(inotify[0], inotify[1], interval)
+                    for path in changed:
+                        if is_source_file(path) and os.path.exists(path):
+                            pending[path] = time.time()
+                    # 有事件时重新扫描，新增、改名、删除的文件都反映到输出冲突检查里
+                    if changed:
+                        snapshot = scan_directories(directories)
+                else:
+                    time.sleep(interval)
+                    current = scan_directories(directories)
+                    for path, state in current.items():
+                        if snapshot.get(path) != state:
+                            pending[path] = now
+                    snapshot = current
+                
+                # 2. 安静超过防抖时间的文件提交重建（同一本书不会同时构建两次）
+                now = time.time()
+                busy = {input_file for input_file, _ in running.values()}
+                for input_file, changed_at in list(pending.items()):
+                    if input_file in busy or now - changed_at < debounce:
+                        continue
+                    if len(running) >= jobs:
+                        break
+                    del pending[input_file]
+                    output_file = batch_output_file(input_file, output_dir)
+                    collisions = output_collisions(sorted(set(snapshot) | {input_file}), output_dir)
+                    if input_file in collisions:
+                        print(f"跳过: {input_file} 与 {collisions[input_file]} 的输出文件相同 ({output_file})，请改名")
+                        continue
+                    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                    hint_key = os.path.abspath(input_file)
+                    hints = {hint_key: encoding_hints[hint_key]} if hint_key in encoding_hints else {}
+                    future = executor.submit(batch_worker, input_file, output_file, options, hints)
+                    running[future] = (input_file, output_file)
+                    print(f"重新生成: {input_file}")
+                
+                # 3. 收集完成的构建
+                if running:
+                    done, _ = wait(list(running), timeout=0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        input_file, output_file = running.pop(future)
+                        result, elapsed, log = future.result()
+                        if result is None:
+                            print(f"失败: {input_file}")
+                            continue
+                        if result.get('encoding'):
+                            encoding_hints[os.path.abspath(input_file)] = result['encoding']
+                        target_dir = os.path.dirname(output_file)
+                        manifest = manifests.setdefault(target_dir, load_build_manifest(target_dir))
+                        record_build(manifest, input_file, output_file, signature, result)
+                        save_build_manifest(target_dir, manifest)
+                        print(f"完成: {input_file} -> {output_file} "
+                              f"({result['chapters']} 章, {elapsed:.1f} 秒)")
+        except KeyboardInterrupt:
+            print("\n停止监视")
+        finally:
+            if inotify:
+                os.close(inotify[0])
+
+def encoding_name(text):
+    """命令行 --encoding 的取值：Python 可识别的编码名"""
+    try:
+        return codecs.lookup(text).name
+    except LookupError:
+        raise argparse.ArgumentTypeError(f"未知编码: {text}")
+
+def int_at_least(minimum):
+    """命令行整数参数的取值：不小于 minimum 的整数"""
+    def parse(text):
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"不是整数: {text}")
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"不能小于 {minimum}: {text}")
+        return value
+    return parse
+
+def add_pipeline_arguments(parser):
+    """处理流程参数（单文件和批量模式共用）"""
+    parser.add_argument('--dedup', choices=['merge', 'flag'],
+                        help="检测近似重复章节: merge 合并并保留锚点跳转, flag 仅标记")
+    parser.add_argument('--dedup-threshold', type=float, default=0.8,
+                        help="重复章节相似度阈值 (默认: 0.8)")
+    parser.add_argument('--balance', choices=['count', 'size'], default='count',
+                        help="区块分配方式: count 按章节数平均, size 按文本字节数平均 (默认: count)")
+    parser.add_argument('--fanout', type=int_at_least(2), default=26,
+                        help="超大区块每级最多拆分的子区块数 (默认: 26)")
+    parser.add_argument('--leaf-size', type=int_at_least(0), default=200,
+                        help="每个叶子区块最多章节数，超过则拆分为子区块，0 表示不拆分 (默认: 200)")
+    parser.add_argument('--assets', choices=['inline', 'external'], default='inline',
+                        help="样式和脚本: inline 内嵌在每个页面, external 写入共享资源目录"
+                             "（文件名带内容哈希，可被浏览器缓存）(默认: inline)")
+    parser.add_argument('--assets-dir', metavar='DIR',
+                        help="external 模式的共享资源目录（默认: 输出目录下的 assets）")
+    parser.add_argument('--markup', choices=['full', 'compact'], default='full',
+                        help="章节标记: full 完整输出, compact 精简章节和段落标记，"
+                             "图标、链接和段落id由页面脚本生成，显示效果相同 (默认: full)")
+    parser.add_argument('--minify', action='store_true',
+                        help="压缩页面中的样式和脚本（去掉注释和多余空白，每个进程只做一次）")
+    parser.add_argument('--fts', metavar='DB',
+                        help="同时导出章节和段落到 SQLite 全文检索库（多本书可共用一个库），"
+                             "用 python xds.py query DB 关键词 搜索")
+    parser.add_argument('--fts-tokenizer', choices=['trigram', 'bigram'], default='trigram',
+                        help="新建检索库的中文分词: trigram 三字, bigram 两字（两字查询也走索引）(默认: trigram)")
+    parser.add_argument('--suffix-array', action='store_true',
+                        help="对正文建后缀数组，写入 <输出文件名>.sa，用 python xds.py query 文件.sa 子串 精确查找"
+                             "（纯 Python 构建，约每百万字数秒）")
+    parser.add_argument('--index', choices=['chapters', 'postings'],
+                        help="把分章结果写入 <输出文件名>.idx，源文件未变时再次生成直接取用，跳过编码检测和分章；"
+                             "postings 另加全文位置索引，供 query 和 serve 使用")
+    parser.add_argument('--encoding', type=encoding_name, metavar='NAME',
+                        help="指定源文件编码（如 gbk、big5、utf-8），不做编码检测；"
+                             f"默认自动检测，并按文件指纹缓存判断结果（{ENCODING_CACHE_FILE}）")
+    parser.add_argument('--profile', default='default', metavar='NAME|PATH',
+                        help=f"页面主题: {', '.join(PROFILES)}，或主题文件（JSON，"
+                             f"\"base\" 指定基础主题，其余键覆盖）(默认: default)")
+
+def pipeline_options(args):
+    """从命令行参数取出 process_large_html_file 的选项"""
+    return {
+        'dedup': args.dedup,
+        'dedup_threshold': args.dedup_threshold,
+        'balance': args.balance,
+        'fanout': args.fanout,
+        'leaf_size': args.leaf_size,
+        'profile': args.profile,
+        'assets': args.assets,
+        'assets_dir': args.assets_dir,
+        'markup': args.markup,
+        'minify': args.minify,
+        'fts': args.fts,
+        'fts_tokenizer': args.fts_tokenizer,
+        'suffix_array': args.suffix_array,
+        'index': args.index,
+        'encoding': args.encoding,
+    }
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(description="生成全文搜索版HTML",
+                                     epilog="批量模式: python xds.py batch <目录或通配符>... [-j N]; "
+                                            "基准测试: python xds.py bench [--size 50MB ...]; "
+                                            "回归检查: python xds.py golden record|check; "
+                                            "检索: python xds.py query <检索库|.sa|.idx文件> <关键词>; "
+                                            "书库: python xds.py library <目录>... -o <书库目录>; "
+                                            "阅读服务: python xds.py serve <目录>... [--port 8000]")
+    parser.add_argument('input_file', nargs='?', help="输入文件")
+    parser.add_argument('output_file', nargs='?', help="输出文件（默认: <输入文件名>_search.html）")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="把分阶段统计（耗时、CPU时间、字节数、MB/s）写入JSON文件")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="用 tracemalloc 统计各阶段内存峰值、主要分配位置和进程最大RSS（处理会明显变慢）")
+    parser.add_argument('--watch', action='append', metavar='DIR',
+                        help="监视目录，源文件变化后自动重新生成（可重复指定）")
+    parser.add_argument('--watch-interval', type=float, default=1.0,
+                        help="监视模式轮询间隔秒数 (默认: 1.0)")
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help="监视模式防抖秒数，文件在此时间内无变化才重建 (默认: 2.0)")
+    parser.add_argument('--inotify', action='store_true',
+                        help="监视模式使用 inotify（仅Linux，不可用时退回轮询）")
+    parser.add_argument('-o', '--output-dir',
+                        help="监视模式输出目录（默认: 与输入文件相同）")
+    parser.add_argument('-j', '--jobs', type=int, default=2,
+                        help="监视模式并行进程数 (默认: 2)")
+    add_pipeline_arguments(parser)
+    return parser
+
+def build_batch_arg_parser():
+    """批量模式命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py batch", description="批量生成全文搜索版HTML")
+    parser.add_argument('targets', nargs='+', help="输入目录、文件或通配符")
+    parser.add_argument('-o', '--output-dir', help="输出目录（默认: 与输入文件相同）")
+    parser.add_argument('-j', '--jobs', type=int, help="并行进程数（默认: CPU核数）")
+    parser.add_argument('--force', action='store_true', help="忽略已是最新的输出，全部重新生成")
+    parser.add_argument('--metrics-dir', metavar='DIR',
+                        help="把每个文件的分阶段统计写入该目录下的 <文件名>.metrics.json")
+    add_pipeline_arguments(parser)
+    return parser
+
+def main(default_profile='default'):
+    """主函数
+
+    default_profile: 未指定 --profile 时使用的主题（xds1.py 使用 h5-compact）
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        import xds_bench
+        sys.exit(xds_bench.main(sys.argv[2:]))
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'golden':
+        import xds_golden
+        sys.exit(xds_golden.main(sys.argv[2:]))
+    
+    if len(sys.argv) > 2 and sys.argv[1] == 'query' and sys.argv[2].endswith('.sa'):
+        import xds_suffix
+        sys.exit(xds_suffix.main(sys.argv[2:]))
+    
+    if len(sys.argv) > 2 and sys.argv[1] == 'query' and sys.argv[2].endswith('.idx'):
+        import xds_index
+        sys.exit(xds_index.main(sys.argv[2:]))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        import xds_fts
+        sys.exit(xds_fts.main(sys.argv[2:]))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'library':
+        import xds_library
+        sys.exit(xds_library.main(sys.argv[2:], default_profile))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        import xds_serve
+        sys.exit(xds_serve.main(sys.argv[2:]))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        parser = build_batch_arg_parser()
+        parser.set_defaults(profile=default_profile)
+        args = parser.parse_args(sys.argv[2:])
+        process_batch(args.targets, pipeline_options(args), args.output_dir, args.jobs, args.force,
+                      args.metrics_dir)
+        return
     
-    if current_para:
-        para_text = '。'.join(current_para) + '。'
-        paragraphs.append(para_text)
+    parser = build_arg_parser()
+    parser.set_defaults(profile=default_profile)
+    args = parser.parse_args()
+    if args.watch:
+        watch_directories(args.watch, pipeline_options(args), args.output_dir, jobs=args.jobs,
+                          interval=args.watch_interval, debounce=args.debounce,
+                          use_inotify=args.inotify)
+        return
     
-    return paragraphs if paragraphs else [text[:max_length] + "..."]
-
-def main():
-    """主函数"""
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    if args.input_file:
+        input_file = args.input_file
+        output_file = args.output_file
     else:
         # 如果没有参数，使用当前目录下的第一个htm/html文件
         html_files = list(Path('.').glob('*.htm')) + list(Path('.').glob('*.html'))
@@ -1348,7 +3152,8 @@ def main():
             input("按回车退出...")
             return
     
-    process_large_html_file(input_file, output_file)
+    process_large_html_file(input_file, output_file, metrics_json=args.metrics_json,
+                            profile_memory=args.profile_memory, **pipeline_options(args))
 
 if __name__ == "__main__":
     main()
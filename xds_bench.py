@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""xds.py 基准测试 - 确定性合成小说生成器 + 分阶段计时 + 基线对比
+
+用法:
+    python xds.py bench                                  # 运行内置测试集
+    python xds.py bench --size 50MB --encoding gbk --heading 回 --dist lognormal --toc
+    python xds.py bench --baseline bench_baseline.json --update-baseline
+    python xds.py bench --generate book.htm --size 1GB  # 只生成合成小说
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import argparse
+import tempfile
+import contextlib
+import io
+
+import xds
+
+# 内置测试集：(大小, 编码, 标题样式, 章节长度分布, 目录, 网站杂项)
+DEFAULT_SUITE = [
+    ('5MB', 'utf-8', '章', 'normal', False, False),
+    ('5MB', 'gbk', '回', 'lognormal', True, False),
+    ('5MB', 'gb18030', 'h2', 'uniform', False, True),
+    ('5MB', 'big5', '节', 'normal', False, False),
+    ('5MB', 'utf-8', 'chapter', 'lognormal', True, True),
+]
+
+HEADING_STYLES = ['章', '回', '节', 'h2', 'chapter']
+DISTRIBUTIONS = ['uniform', 'normal', 'lognormal']
+ENCODINGS = ['utf-8', 'gbk', 'gb18030', 'big5']
+
+SIMPLIFIED_CHARS = ('的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过'
+                    '天去能对小多然于心学么之都好看起发当没成只如事把还用样道想作种开美总从无情己面最女但现前些所同'
+                    '日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感')
+TRADITIONAL_CHARS = ('的一是了我不人在他有這個上們來到時大地為子中你說生國年著就那和要她出也得裡後自以會家可下而過'
+                     '天去能對小多然於心學麼之都好看起發當沒成只如事把還用樣道想作種開美總從無情己面最女但現前些所同'
+                     '日手又行意動方期它頭經長兒回位分愛老因很給名法間斯知世什兩次使身者被高已親其進此話常與活正感')
+SENTENCE_ENDS = '。。。。！？'
+
+CHINESE_DIGITS = '零一二三四五六七八九'
+
+
+def parse_size(text):
+    """解析 '10MB'、'1GB'、'512KB' 为字节数"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"无法解析大小: {text}")
+    number, unit = float(match.group(1)), match.group(2).upper()
+    return int(number * {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[unit])
+
+
+def chinese_number(num):
+    """整数转中文数字（章回标题用）"""
+    if num < 10:
+        return CHINESE_DIGITS[num]
+    units = [(1000, '千'), (100, '百'), (10, '十')]
+    result = ''
+    need_zero = False
+    for value, unit in units:
+        digit = num // value
+        num %= value
+        if digit:
+            if need_zero:
+                result += '零'
+            result += ('' if (value == 10 and digit == 1 and not result) else CHINESE_DIGITS[digit]) + unit
+            need_zero = False
+        elif result:
+            need_zero = True
+    if num:
+        result += ('零' if need_zero else '') + CHINESE_DIGITS[num]
+    return result
+
+
+def heading_text(style, num, title):
+    """生成章节标题标记"""
+    if style == '章':
+        return f'<div class="title">第{num}章 {title}</div>'
+    if style == '回':
+        return f'<div class="title">第{chinese_number(num)}回 {title}</div>'
+    if style == '节':
+        return f'<div class="title">第{num}节 {title}</div>'
+    if style == 'h2':
+        return f'<h2>第{num}章 {title}</h2>'
+    return f'<div class="title">Chapter {num} {title}</div>'
+
+
+def chapter_lengths(rng, distribution, mean_length):
+    """按分布生成章节长度（字符数）的无限序列"""
+    while True:
+        if distribution == 'uniform':
+            yield mean_length
+        elif distribution == 'normal':
+            yield max(200, int(rng.gauss(mean_length, mean_length * 0.3)))
+        else:
+            # 对数正态：大部分章节较短，少数章节长出百倍
+            yield max(100, min(int(rng.lognormvariate(0, 1.2) * mean_length * 0.5), mean_length * 100))
+
+
+def generate_synthetic_book(path, size, encoding='utf-8', heading='章', distribution='normal',
+                            toc=False, boilerplate=False, seed=42, mean_chapter_length=3000):
+    """生成确定性的合成小说HTML - 逐章写入，内存占用与总大小无关
+
+    同样的参数和 seed 总是生成完全相同的文件；返回章节数
+    """
+    rng = random.Random(seed)
+    chars = TRADITIONAL_CHARS if encoding == 'big5' else SIMPLIFIED_CHARS
+
+    # 预先生成句子池，之后只做随机挑选
+    sentence_pool = []
+    for _ in range(4000):
+        sentence = ''.join(rng.choice(chars) for _ in range(rng.randint(6, 40)))
+        if rng.random() < 0.4:
+            comma = rng.randint(2, len(sentence) - 2)
+            sentence = sentence[:comma] + '，' + sentence[comma:]
+        if rng.random() < 0.15:
+            sentence = '“' + sentence + rng.choice(SENTENCE_ENDS) + '”'
+        else:
+            sentence += rng.choice(SENTENCE_ENDS)
+        sentence_pool.append(sentence)
+    title_pool = [''.join(rng.choice(chars) for _ in range(rng.randint(2, 8))) for _ in range(500)]
+
+    def encode(text):
+        return text.encode(encoding, errors='xmlcharrefreplace')
+
+    head = encode(f'<html>\n<head>\n<meta charset="{encoding}">\n<title>合成小说 {seed}</title>\n'
+                  '<style>body {{ font-size: 16px; }}</style>\n</head>\n<body>\n')
+    tail = encode('</body>\n</html>\n')
+
+    # 按目标大小估算章节数，再生成固定的章节长度序列
+    bytes_per_char = 1 if encoding == 'utf-8' and heading == 'chapter' else (3 if encoding == 'utf-8' else 2)
+    lengths = []
+    estimated = 0
+    for length in chapter_lengths(rng, distribution, mean_chapter_length):
+        lengths.append(length)
+        estimated += length * bytes_per_char + 200
+        if estimated >= size:
+            break
+    titles = [rng.choice(title_pool) for _ in lengths]
+
+    written = 0
+    chapters_written = 0
+    with open(path, 'wb') as f:
+        written += f.write(head)
+
+        if toc:
+            toc_lines = ['<div class="toc">']
+            for num, title in enumerate(titles, 1):
+                toc_lines.append(f'<a href="#c{num}">{heading_text(heading, num, title)}</a><br>')
+            toc_lines.append('</div>\n')
+            written += f.write(encode('\n'.join(toc_lines)))
+
+        for num, (length, title) in enumerate(zip(lengths, titles), 1):
+            if written >= size:
+                break
+            parts = [f'<a name="c{num}"></a>', heading_text(heading, num, title)]
+            if boilerplate:
+                parts.append('<div class="nav">上一章 | 返回目录 | 下一章 | 加入书签</div>')
+
+            paragraph = []
+            paragraph_length = 0
+            chapter_length = 0
+            while chapter_length < length:
+                sentence = rng.choice(sentence_pool)
+                paragraph.append(sentence)
+                paragraph_length += len(sentence)
+                chapter_length += len(sentence)
+                if paragraph_length > rng.randint(80, 400):
+                    parts.append('<p>' + ''.join(paragraph) + '</p>')
+                    paragraph = []
+                    paragraph_length = 0
+            if paragraph:
+                parts.append('<p>' + ''.join(paragraph) + '</p>')
+
+            if boilerplate:
+                parts.append('<div class="ad">本站域名已更换，请收藏新地址，最新章节抢先看。</div>')
+                parts.append('<script>var chapter_id = %d;</script>' % num)
+            written += f.write(encode('\n'.join(parts) + '\n'))
+            chapters_written += 1
+
+        written += f.write(tail)
+
+    return chapters_written
+
+
+def case_key(size_text, encoding, heading, distribution, toc, boilerplate):
+    """测试用例标识（同时用作合成文件名和基线的键）"""
+    heading_names = {'章': 'zhang', '回': 'hui', '节': 'jie'}
+    return (f"{size_text.lower()}-{encoding}-{heading_names.get(heading, heading)}-{distribution}"
+            f"-toc{int(toc)}-bp{int(boilerplate)}")
+
+
+def run_case(case, work_dir, repeat=1, seed=42):
+    """运行一个测试用例：生成（或复用）合成小说，处理 repeat 次，各阶段取最快一次"""
+    size_text, encoding, heading, distribution, toc, boilerplate = case
+    key = case_key(*case)
+    input_file = os.path.join(work_dir, f"{key}-s{seed}.htm")
+    if not os.path.exists(input_file):
+        print(f"生成合成小说: {input_file}")
+        generate_synthetic_book(input_file, parse_size(size_text), encoding, heading,
+                                distribution, toc, boilerplate, seed)
+
+    output_file = os.path.join(work_dir, f"{key}_search.html")
+    metrics_file = os.path.join(work_dir, f"{key}.metrics.json")
+    best = None
+    for _ in range(repeat):
+        # 每次重新检测编码，避免进程内和跨进程的编码判断缓存让后几次变快
+        xds.ENCODING_HINTS.clear()
+        xds.ENCODING_CACHE_FILE = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = xds.process_large_html_file(input_file, output_file, metrics_json=metrics_file)
+        if result is None:
+            raise RuntimeError(f"处理失败: {input_file}")
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        best = report if best is None else merge_best(best, report)
+    return key, best
+
+
+def merge_best(best, report):
+    """合并两次运行的统计，每个阶段保留耗时最短的一次"""
+    stages = {stage['name']: stage for stage in best['stages']}
+    for stage in report['stages']:
+        if stage['name'] not in stages or stage['wall_s'] < stages[stage['name']]['wall_s']:
+            stages[stage['name']] = stage
+    best = dict(best)
+    best['stages'] = list(stages.values())
+    if report['total']['wall_s'] < best['total']['wall_s']:
+        best['total'] = report['total']
+    return best
+
+
+# 耗时过短的阶段计时噪声大，不参与基线对比
+MIN_STAGE_SECONDS = 0.01
+
+
+def summarize(report):
+    """提取用于基线对比的吞吐数据 {阶段: MB/s}"""
+    summary = {stage['name']: stage['mb_per_s'] for stage in report['stages']
+               if stage['mb_per_s'] and stage['wall_s'] >= MIN_STAGE_SECONDS}
+    summary['total'] = report['total']['mb_per_s']
+    return summary
+
+
+def compare_with_baseline(key, summary, baseline, threshold):
+    """与基线对比，返回退化的阶段列表 [(阶段, 基线MB/s, 当前MB/s)]"""
+    regressions = []
+    for stage, baseline_rate in baseline.get(key, {}).items():
+        current_rate = summary.get(stage)
+        if current_rate is None or not baseline_rate:
+            continue
+        if current_rate < baseline_rate * (1 - threshold):
+            regressions.append((stage, baseline_rate, current_rate))
+    return regressions
+
+
+def print_case_report(key, report, baseline_rates):
+    """打印单个用例的分阶段结果"""
+    print(f"\n== {key}  ({report['input_bytes'] / (1024*1024):.1f} MB, {report['chapters']} 章, "
+          f"编码 {report['encoding']})")
+    print(f"{'阶段':<12}{'墙钟(秒)':>10}{'MB/s':>10}{'基线MB/s':>11}{'变化':>9}")
+    rows = [(stage['name'], stage['wall_s'], stage['mb_per_s'], stage['parent']) for stage in report['stages']]
+    rows.append(('total', report['total']['wall_s'], report['total']['mb_per_s'], None))
+    for name, wall, rate, parent in rows:
+        label = ('  ' + name) if parent else name
+        base = baseline_rates.get(name)
+        change = f"{(rate / base - 1) * 100:+.1f}%" if (base and rate) else '-'
+        print(f"{label:<12}{wall:>12.3f}{(rate or 0):>12.1f}{(base or 0):>13.1f}{change:>10}")
+
+
+def build_arg_parser():
+    """bench 命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py bench", description="xds.py 基准测试")
+    parser.add_argument('--size', help="合成小说大小，如 1MB、200MB、1GB（指定任一用例参数时只运行该用例）")
+    parser.add_argument('--encoding', choices=ENCODINGS)
+    parser.add_argument('--heading', choices=HEADING_STYLES, help="章节标题样式")
+    parser.add_argument('--dist', choices=DISTRIBUTIONS, help="章节长度分布")
+    parser.add_argument('--toc', action='store_true', help="包含目录")
+    parser.add_argument('--boilerplate', action='store_true', help="包含网站导航、广告、脚本等杂项")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子 (默认: 42)")
+    parser.add_argument('--repeat', type=int, default=3, help="每个用例重复次数，取最快一次 (默认: 3)")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'xds-bench'),
+                        help="合成小说和输出的存放目录（已存在的合成文件会复用）")
+    parser.add_argument('--baseline', help="基线文件（JSON）")
+    parser.add_argument('--update-baseline', action='store_true', help="把本次结果写入基线文件")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="吞吐下降超过该比例视为退化 (默认: 0.15)")
+    parser.add_argument('--generate', metavar='PATH', help="只生成合成小说到该路径，不运行测试")
+    return parser
+
+
+def main(argv=None):
+    """bench 入口，返回进程退出码（有退化时为1）"""
+    args = build_arg_parser().parse_args(argv)
+    single_case = any([args.size, args.encoding, args.heading, args.dist, args.toc, args.boilerplate])
+    case = (args.size or '5MB', args.encoding or 'utf-8', args.heading or '章',
+            args.dist or 'normal', args.toc, args.boilerplate)
+
+    if args.generate:
+        chapters = generate_synthetic_book(args.generate, parse_size(case[0]), case[1], case[2],
+                                           case[3], case[4], case[5], args.seed)
+        print(f"已生成: {args.generate} ({os.path.getsize(args.generate) / (1024*1024):.1f} MB, {chapters} 章)")
+        return 0
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    cases = [case] if single_case else DEFAULT_SUITE
+    results = {}
+    failures = []
+    for bench_case in cases:
+        key, report = run_case(bench_case, args.work_dir, args.repeat, args.seed)
+        summary = summarize(report)
+        results[key] = summary
+        print_case_report(key, report, baseline.get(key, {}))
+        for stage, base_rate, rate in compare_with_baseline(key, summary, baseline, args.threshold):
+            failures.append(f"{key} / {stage}: {base_rate:.1f} -> {rate:.1f} MB/s")
+
+    if args.baseline and args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n基线已更新: {args.baseline}")
+
+    if failures:
+        print(f"\n性能退化（阈值 {args.threshold:.0%}）:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+
+    print("\n基准测试完成" + ("，未发现性能退化" if baseline else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""全文检索库 - 把各本书的章节和段落写入 SQLite FTS5，在终端里跨书搜索
+
+生成页面时顺便导出（批量模式可多本书写入同一个库）:
+    python xds.py book.htm --fts library.db
+    python xds.py batch books/ --fts library.db
+搜索:
+    python xds.py query library.db 黄蓉 [-n 20] [--book 射雕]
+
+中文没有空格分词，索引按字切分：trigram 用 SQLite 自带的三元组分词器（需要 SQLite 3.34+），
+bigram 把正文切成相邻两字的词再交给 unicode61 分词器，两个字的查询也能走索引。
+索引用不上的短查询（trigram 少于三个字、bigram 单字）退回逐段 LIKE 扫描。
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+
+# 库结构版本，结构或 bigram 切分方式改变时递增
+SCHEMA_VERSION = 2
+
+TOKENIZERS = ('trigram', 'bigram')
+
+# 多个批量进程同时写同一个库时等待锁的秒数
+BUSY_TIMEOUT = 60
+
+# bigram 模式：连续的中日韩字符按两字切分，其余按单词（单词不含中日韩字符，“3个苹果”切为 3、个苹、苹果）
+CJK_RUN_PATTERN = re.compile(r'[㐀-鿿豈-﫿]+|[^\W_㐀-鿿豈-﫿]+')
+
+# 段落摘要中命中词前后保留的字数
+SNIPPET_CONTEXT = 30
+
+
+def bigrams(text):
+    """bigram 模式的索引文本：中文相邻两字为一词，单字保留为一词，其余按单词（小写）"""
+    tokens = []
+    for run in CJK_RUN_PATTERN.findall(text):
+        if not ('㐀' <= run[0] <= '鿿' or '豈' <= run[0] <= '﫿'):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return ' '.join(tokens)
+
+
+def supports_trigram():
+    """当前 SQLite 是否带 trigram 分词器"""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+def open_library(db_path, tokenizer='trigram'):
+    """打开（必要时创建）检索库；已有库沿用建库时的分词方式"""
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    row = connection.execute("SELECT value FROM meta WHERE key = 'tokenizer'").fetchone()
+    if row:
+        schema = connection.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if row[0] == 'bigram' and schema and int(schema[0]) < 2:
+            print(f"警告: 检索库 '{db_path}' 用旧的 bigram 切分建立，数字或字母后紧跟的中文可能搜不到，请删除后重新导出")
+        return connection, row[0]
+
+    if tokenizer == 'trigram' and not supports_trigram():
+        print(f"SQLite {sqlite3.sqlite_version} 不支持 trigram 分词，改用 bigram")
+        tokenizer = 'bigram'
+    fts_tokenizer = 'trigram' if tokenizer == 'trigram' else 'unicode61'
+    with connection:
+        connection.execute('''CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY,
+            source TEXT UNIQUE,
+            output TEXT,
+            title TEXT,
+            chapters INTEGER,
+            encoding TEXT,
+            built REAL)''')
+        connection.execute('''CREATE TABLE IF NOT EXISTS chapters (
+            book_id INTEGER,
+            num INTEGER,
+            title TEXT,
+            paragraphs INTEGER,
+            PRIMARY KEY (book_id, num))''')
+        # text 为原文；grams 为索引文本（trigram 模式下就是原文，不另存）
+        connection.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+            grams, text UNINDEXED, book_id UNINDEXED, chapter UNINDEXED, para UNINDEXED,
+            tokenize='{fts_tokenizer}')''')
+        connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                               [('schema', str(SCHEMA_VERSION)), ('tokenizer', tokenizer)])
+    return connection, tokenizer
+
+
+def export_book(db_path, source, output, chapters, encoding=None, tokenizer='trigram'):
+    """写入一本书，替换该书以前导出的内容
+
+    chapters: [(章节号, 标题, [段落, ...]), ...]，段落与页面中的 <p> 一一对应
+    返回写入的段落数
+    """
+    connection, tokenizer = open_library(db_path, tokenizer)
+    source = os.path.abspath(source)
+    title = os.path.splitext(os.path.basename(source))[0]
+    try:
+        with connection:
+            row = connection.execute('SELECT id FROM books WHERE source = ?', (source,)).fetchone()
+            if row:
+                book_id = row[0]
+                connection.execute('DELETE FROM segments WHERE book_id = ?', (book_id,))
+                connection.execute('DELETE FROM chapters WHERE book_id = ?', (book_id,))
+                connection.execute('UPDATE books SET output = ?, title = ?, chapters = ?, encoding = ?, built = ? '
+                                   'WHERE id = ?', (output, title, len(chapters), encoding, time.time(), book_id))
+            else:
+                book_id = connection.execute(
+                    'INSERT INTO books (source, output, title, chapters, encoding, built) VALUES (?, ?, ?, ?, ?, ?)',
+                    (source, output, title, len(chapters), encoding, time.time())).lastrowid
+
+            connection.executemany('INSERT INTO chapters VALUES (?, ?, ?, ?)',
+                                   [(book_id, num, chap_title, len(paragraphs))
+                                    for num, chap_title, paragraphs in chapters])
+            # 章节标题作为第 -1 段，标题命中也能搜到
+            rows = ((chap_title, num, -1) for num, chap_title, _ in chapters)
+            rows = [*rows, *((para, num, i) for num, _, paragraphs in chapters for i, para in enumerate(paragraphs))]
+            index_text = bigrams if tokenizer == 'bigram' else (lambda text: text)
+            connection.executemany('INSERT INTO segments (grams, text, book_id, chapter, para) VALUES (?, ?, ?, ?, ?)',
+                                   ((index_text(text), text if tokenizer == 'bigram' else None, book_id, num, i)
+                                    for text, num, i in rows))
+    finally:
+        connection.close()
+    return len(rows) - len(chapters)
+
+
+def match_expression(query, tokenizer):
+    """查询词转为 FTS5 MATCH 表达式（多个词为“与”）；无法用索引时返回 None"""
+    terms = query.split()
+    phrases = []
+    for term in terms:
+        if tokenizer == 'bigram':
+            grams = bigrams(term)
+            # 单字可能只出现在两字词的后一位，索引查不全
+            if not grams or len(grams) == 1:
+                return None
+            phrases.append('"' + grams.replace('"', '""') + '"')
+        else:
+            if len(term) < 3:
+                return None
+            phrases.append('"' + term.replace('"', '""') + '"')
+    return ' AND '.join(phrases) if phrases else None
+
+
+def like_pattern(text):
+    """包含 text 的 LIKE 模式（配合 ESCAPE '\\'，text 中的 % 和 _ 按原字符匹配）"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def search(connection, tokenizer, query, limit=20, book=None):
+    """返回 (段落命中, 章节命中, 命中段落数, 命中章节数)
+
+    段落命中按 FTS5 的 rank（bm25）排序；章节按命中段落数和其中最好的段落得分排序。
+    查询词无法走索引时退回 LIKE 扫描
+    """
+    expression = match_expression(query, tokenizer)
+    text_column = 'text' if tokenizer == 'bigram' else 'grams'
+    where, params = [], []
+    if expression:
+        where.append('segments MATCH ?')
+        params.append(expression)
+        rank = 'rank'
+    else:
+        for term in query.split():
+            where.append(f"{text_column} LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(term))
+        rank = '0'
+    if book:
+        where.append("book_id IN (SELECT id FROM books WHERE title LIKE ? ESCAPE '\\')")
+        params.append(like_pattern(book))
+    matches = f"SELECT book_id, chapter, para, {rank} AS score FROM segments WHERE {' AND '.join(where)}"
+
+    chapters = connection.execute(f'''
+        SELECT book_id, chapter, COUNT(*) AS hits, MIN(score) AS best FROM ({matches})
+        GROUP BY book_id, chapter ORDER BY hits DESC, best''', params).fetchall()
+    hits = connection.execute(f'''
+        SELECT book_id, chapter, para, {text_column}, {rank} AS score FROM segments
+        WHERE {' AND '.join(where)} ORDER BY score LIMIT ?''', params + [limit]).fetchall()
+    return hits, [row[:3] for row in chapters[:limit]], sum(row[2] for row in chapters), len(chapters)
+
+
+def snippet(text, query):
+    """命中词前后各截取一段，命中处用【】标出"""
+    terms = [term for term in query.split() if term]
+    positions = [(text.lower().find(term.lower()), term) for term in terms]
+    positions = [(pos, term) for pos, term in positions if pos >= 0]
+    if not positions:
+        return text[:SNIPPET_CONTEXT * 2] + ('…' if len(text) > SNIPPET_CONTEXT * 2 else '')
+    pos, term = min(positions)
+    start = max(0, pos - SNIPPET_CONTEXT)
+    end = min(len(text), pos + len(term) + SNIPPET_CONTEXT)
+    excerpt = text[start:end].replace('\n', ' ')
+    for term in terms:
+        excerpt = re.sub(re.escape(term), lambda m: f'【{m.group(0)}】', excerpt, flags=re.IGNORECASE)
+    return ('…' if start > 0 else '') + excerpt + ('…' if end < len(text) else '')
+
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py query", description="在 --fts 导出的检索库中跨书搜索")
+    parser.add_argument('db', help="检索库路径（生成时用 --fts 指定）")
+    parser.add_argument('query', nargs='+', help="查询词，多个词须同时出现在同一段落")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="显示的章节和段落数 (默认: 20)")
+    parser.add_argument('--book', help="只搜索书名包含该文字的书")
+    return parser
+
+
+def main(argv=None):
+    """query 入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"错误: 检索库 '{args.db}' 不存在")
+        return 1
+    query = ' '.join(args.query)
+    connection, tokenizer = open_library(args.db)
+    start_time = time.perf_counter()
+    hits, chapters, total, total_chapters = search(connection, tokenizer, query, args.limit, args.book)
+    books = {book_id: (title, output) for book_id, title, output in
+             connection.execute('SELECT id, title, output FROM books')}
+    titles = {}
+    for book_id, chapter, _ in chapters:
+        row = connection.execute('SELECT title FROM chapters WHERE book_id = ? AND num = ?',
+                                 (book_id, chapter)).fetchone()
+        titles[book_id, chapter] = row[0] if row else ''
+    elapsed = (time.perf_counter() - start_time) * 1000
+    connection.close()
+
+    print(f'"{query}" 命中 {total} 个段落，分布在 {total_chapters} 个章节（{elapsed:.1f} ms）')
+    if not hits:
+        return 0
+    print("\n章节:")
+    for book_id, chapter, count in chapters:
+        title, output = books[book_id]
+        print(f"  {title}  {titles[book_id, chapter]}  ({count} 处)  {output}#chap-{chapter}")
+    print("\n段落:")
+    for book_id, chapter, para, text, _ in hits:
+        label = '标题' if para < 0 else f'第{para + 1}段'
+        print(f"  {books[book_id][0]} #chap-{chapter} {label}: {snippet(text, query)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""金标准输出回归检查 - 覆盖 xds.py 和 xds1.py 两个版本
+
+先记录金标准，之后每次改动清理、分割、渲染代码后检查输出是否一致:
+    python xds.py golden record                  # 记录金标准（仓库HTML语料 + 合成小说）
+    python xds.py golden check                   # 检查当前实现（只检查记录过的输入）
+    python xds.py golden check --set balance=size --variant xds   # 检查某个选项/快速路径
+    python xds.py golden check --engine DIR      # 检查另一份代码（如 git worktree）中的实现
+输出不一致时给出结构化差异（区块、章节、标题、段落、样式脚本）。
+
+仓库中的 golden/ 只记录三本合成小说（确定性生成，覆盖 UTF-8/GBK/Big5、章/回/h2 标题、目录页、页眉页脚），
+最初由基线版本记录:
+    git worktree add /tmp/xds-baseline ad5aa2e
+    python xds.py golden record --no-corpus --engine /tmp/xds-baseline
+有意改变输出的改动在同一提交中用 python xds.py golden record --no-corpus 重新记录。
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import glob
+import difflib
+import hashlib
+import argparse
+import tempfile
+import inspect
+import importlib
+import contextlib
+import io
+from html.parser import HTMLParser
+
+import xds_bench
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GOLDEN_DIR = os.path.join(REPO_DIR, 'golden')
+
+# 两个生成器版本（模块名）
+VARIANTS = ['xds', 'xds1']
+
+# 合成小说：(名称, 生成参数)
+SYNTHETIC_BOOKS = [
+    ('synthetic-utf8-zhang', dict(size=300 * 1024, encoding='utf-8', heading='章', distribution='normal')),
+    ('synthetic-gbk-hui-toc', dict(size=300 * 1024, encoding='gbk', heading='回', distribution='lognormal', toc=True)),
+    ('synthetic-big5-h2-boilerplate', dict(size=300 * 1024, encoding='big5', heading='h2', distribution='uniform',
+                                           boilerplate=True)),
+]
+
+MAX_REPORTED_DIFFERENCES = 12
+
+# --engine 导入的其他实现 {(版本, 目录): 模块}
+ENGINES = {}
+
+
+def corpus_files():
+    """仓库中提交的HTML语料（不含生成的 _search.html）"""
+    files = sorted(glob.glob(os.path.join(REPO_DIR, '*.htm')))
+    return [path for path in files if not path.endswith('_search.html')]
+
+
+def synthetic_inputs(work_dir):
+    """生成（或复用）合成小说，返回 [(名称, 路径)]"""
+    inputs = []
+    for name, params in SYNTHETIC_BOOKS:
+        path = os.path.join(work_dir, name + '.htm')
+        if not os.path.exists(path):
+            xds_bench.generate_synthetic_book(path, **params)
+        inputs.append((name, path))
+    return inputs
+
+
+def load_variant(variant, engine_dir=None):
+    """导入生成器版本；指定 engine_dir 时从该目录导入，本进程中的当前实现不受影响"""
+    if engine_dir is None:
+        return importlib.import_module(variant)
+    key = (variant, os.path.abspath(engine_dir))
+    if key not in ENGINES:
+        current = {name: sys.modules.pop(name) for name in VARIANTS if name in sys.modules}
+        sys.path.insert(0, key[1])
+        try:
+            ENGINES[key] = importlib.import_module(variant)
+        finally:
+            sys.path.remove(key[1])
+            for name in VARIANTS:
+                sys.modules.pop(name, None)
+            sys.modules.update(current)
+    return ENGINES[key]
+
+
+def render(variant, input_file, work_dir, options=None, engine_dir=None):
+    """用指定版本处理输入文件，返回规范化后的输出HTML"""
+    module = load_variant(variant, engine_dir)
+    # 不读写用户的编码缓存（~/.cache/xds），输出只取决于输入文件；xds1 转发给它导入的 xds
+    getattr(module, 'xds', module).ENCODING_CACHE_FILE = None
+    output_file = os.path.join(work_dir, f"{variant}-{os.path.basename(input_file)}_search.html")
+    with contextlib.redirect_stdout(io.StringIO()):
+        module.process_large_html_file(input_file, output_file, **(options or {}))
+    with open(output_file, 'r', encoding='utf-8') as f:
+        html = f.read()
+    os.remove(output_file)
+    return normalize_html(html, input_file)
+
+
+def normalize_html(html, input_file):
+    """规范化输出：统一换行，输入路径只保留文件名"""
+    html = html.replace('\r\n', '\n')
+    for path in {input_file, os.path.abspath(input_file)}:
+        for form in (path, escape(path)):
+            html = html.replace(form, os.path.basename(input_file))
+    return html
+
+
+def escape(text):
+    """与 xds.escape_html 一致的转义"""
+    return (text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('"', '&quot;').replace("'", '&#39;'))
+
+
+class StructureParser(HTMLParser):
+    """从生成的页面提取结构：区块 -> 章节 -> 标题/段落文本，与具体标记写法无关"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self.styles = []
+        self.scripts = []
+        self._stack = []          # 打开的元素 (tag, classes)
+        self._chapter = None
+        self._capture = None      # 正在收集文本的目标 ('title' | 'p' | 'style' | 'script')
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get('class') or '').split())
+        self._stack.append((tag, classes))
+
+        if tag == 'div' and 'block' in classes:
+            self.blocks.append({'id': attrs.get('id'), 'chapters': []})
+        elif tag == 'div' and 'chapter' in classes and self.blocks:
+            self._chapter = {'id': attrs.get('id'), 'title': '', 'paragraphs': []}
+            self.blocks[-1]['chapters'].append(self._chapter)
+        elif tag == 'span' and 'chapter-title' in classes and self._chapter is not None:
+            self._start_capture('title')
+        elif tag == 'p' and self._chapter is not None and self._capture is None:
+            self._start_capture('p')
+        elif tag in ('style', 'script'):
+            self._start_capture(tag)
+
+    def handle_endtag(self, tag):
+        # 正文里未转义的孤立结束标签不应关闭外层元素
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, classes = self._stack.pop()
+            if self._capture and open_tag == self._capture_tag:
+                self._finish_capture()
+            if open_tag == 'div' and 'chapter' in classes:
+                self._chapter = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._capture:
+            self._text.append(data)
+
+    def _start_capture(self, kind):
+        self._capture = kind
+        self._capture_tag = {'title': 'span'}.get(kind, kind)
+        self._text = []
+
+    def _finish_capture(self):
+        text = ''.join(self._text)
+        if self._capture == 'title':
+            self._chapter['title'] = text.strip()
+        elif self._capture == 'p':
+            self._chapter['paragraphs'].append(text)
+        elif self._capture == 'style':
+            self.styles.append(text)
+        else:
+            self.scripts.append(text)
+        self._capture = None
+
+
+def extract_structure(html):
+    """解析页面结构"""
+    parser = StructureParser()
+    parser.feed(html)
+    parser.close()
+    return {
+        'blocks': parser.blocks,
+        'template': '\n'.join(parser.styles + parser.scripts),
+    }
+
+
+def shorten(text, limit=40):
+    """差异报告中的文本截断"""
+    text = text.replace('\n', ' ')
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def structural_diff(golden_html, current_html, ignore_template=False):
+    """结构化差异：返回差异描述列表（空列表表示结构一致）"""
+    golden = extract_structure(golden_html)
+    current = extract_structure(current_html)
+    differences = []
+
+    golden_blocks = {block['id']: block for block in golden['blocks']}
+    current_blocks = {block['id']: block for block in current['blocks']}
+    if list(golden_blocks) != list(current_blocks):
+        differences.append(f"区块列表: {len(golden_blocks)} 个 -> {len(current_blocks)} 个 "
+                           f"(缺少 {sorted(set(golden_blocks) - set(current_blocks))[:5]}, "
+                           f"多出 {sorted(set(current_blocks) - set(golden_blocks))[:5]})")
+
+    golden_chapters = {chapter['id']: (block['id'], chapter)
+                       for block in golden['blocks'] for chapter in block['chapters']}
+    current_chapters = {chapter['id']: (block['id'], chapter)
+                        for block in current['blocks'] for chapter in block['chapters']}
+    missing = [cid for cid in golden_chapters if cid not in current_chapters]
+    extra = [cid for cid in current_chapters if cid not in golden_chapters]
+    if missing:
+        differences.append(f"缺少章节 {len(missing)} 个: {missing[:5]}")
+    if extra:
+        differences.append(f"多出章节 {len(extra)} 个: {extra[:5]}")
+
+    for chapter_id, (golden_block, golden_chapter) in golden_chapters.items():
+        if chapter_id not in current_chapters:
+            continue
+        current_block, current_chapter = current_chapters[chapter_id]
+        if golden_block != current_block:
+            differences.append(f"{chapter_id}: 所在区块 {golden_block} -> {current_block}")
+        if golden_chapter['title'] != current_chapter['title']:
+            differences.append(f"{chapter_id}: 标题 '{shorten(golden_chapter['title'])}' -> "
+                               f"'{shorten(current_chapter['title'])}'")
+        golden_paragraphs = golden_chapter['paragraphs']
+        current_paragraphs = current_chapter['paragraphs']
+        if golden_paragraphs != current_paragraphs:
+            if len(golden_paragraphs) != len(current_paragraphs):
+                differences.append(f"{chapter_id}: 段落数 {len(golden_paragraphs)} -> {len(current_paragraphs)}")
+            for index, (old, new) in enumerate(zip(golden_paragraphs, current_paragraphs)):
+                if old != new:
+                    differences.append(f"{chapter_id}: 第{index + 1}段 '{shorten(old)}' -> '{shorten(new)}'")
+                    break
+            if ''.join(golden_paragraphs) != ''.join(current_paragraphs):
+                differences.append(f"{chapter_id}: 章节正文不同（不只是分段位置）")
+
+    if not ignore_template and golden['template'] != current['template']:
+        diff = list(difflib.unified_diff(golden['template'].splitlines(), current['template'].splitlines(),
+                                         'golden', 'current', lineterm='', n=0))
+        added = sum(1 for line in diff if line.startswith('+') and not line.startswith('+++'))
+        removed = sum(1 for line in diff if line.startswith('-') and not line.startswith('---'))
+        differences.append(f"样式/脚本模板: +{added} -{removed} 行")
+        differences.extend('    ' + line for line in diff[2:8])
+
+    return differences
+
+
+def golden_path(golden_dir, variant, name):
+    """金标准文件路径"""
+    return os.path.join(golden_dir, variant, name + '.html.gz')
+
+
+def file_sha1(path):
+    """输入文件指纹，用于发现语料变化"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_inputs(args, work_dir, recorded=None):
+    """本次要处理的输入 [(名称, 路径)]；recorded 为已记录的输入名时只取其中的"""
+    if args.files:
+        return [(os.path.basename(path), path) for path in args.files]
+    inputs = [] if args.no_corpus else [(os.path.basename(path), path) for path in corpus_files()]
+    if not args.no_synthetic:
+        inputs += synthetic_inputs(work_dir)
+    if recorded is not None:
+        inputs = [(name, path) for name, path in inputs if name in recorded]
+    return inputs
+
+
+def unsupported_options(variant, options, engine_dir=None):
+    """该版本的 process_large_html_file 不接受的选项（只转发 **options 的版本按 xds 的参数检查）"""
+    parameters = inspect.signature(load_variant(variant, engine_dir).process_large_html_file).parameters
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values()):
+        parameters = inspect.signature(load_variant('xds', engine_dir).process_large_html_file).parameters
+    return sorted(set(options) - set(parameters))
+
+
+def parse_options(pairs):
+    """--set key=value（值按JSON解析，失败则作为字符串）"""
+    options = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition('=')
+        try:
+            options[key.replace('-', '_')] = json.loads(value)
+        except ValueError:
+            options[key.replace('-', '_')] = value
+    return options
+
+
+def record(args, inputs, work_dir):
+    """记录金标准"""
+    manifest = {'inputs': {}, 'variants': args.variant}
+    for variant in args.variant:
+        os.makedirs(os.path.join(args.golden_dir, variant), exist_ok=True)
+        for name, path in inputs:
+            html = render(variant, path, work_dir, parse_options(args.set), args.engine)
+            with gzip.open(golden_path(args.golden_dir, variant, name), 'wt', encoding='utf-8') as f:
+                f.write(html)
+            manifest['inputs'][name] = file_sha1(path)
+            print(f"已记录 [{variant}] {name}")
+    with open(os.path.join(args.golden_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print(f"金标准已写入: {args.golden_dir}")
+    return 0
+
+
+def recorded_inputs(golden_dir):
+    """金标准中记录过的输入名，没有金标准时为 None"""
+    try:
+        with open(os.path.join(golden_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            return set(json.load(f)['inputs'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def check(args, inputs, work_dir):
+    """检查当前实现与金标准是否一致，返回退出码"""
+    manifest_file = os.path.join(args.golden_dir, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        print(f"未找到金标准，请先运行: python xds.py golden record --golden-dir {args.golden_dir}")
+        return 2
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    options = parse_options(args.set)
+    failures = 0
+    for variant in args.variant:
+        for name, path in inputs:
+            stored = golden_path(args.golden_dir, variant, name)
+            if not os.path.exists(stored):
+                print(f"跳过 [{variant}] {name}: 没有金标准")
+                continue
+            if manifest['inputs'].get(name) not in (None, file_sha1(path)):
+                print(f"警告 [{variant}] {name}: 输入文件在记录金标准后已改变")
+
+            with gzip.open(stored, 'rt', encoding='utf-8') as f:
+                golden_html = f.read()
+            current_html = render(variant, path, work_dir, options, args.engine)
+
+            if current_html == golden_html:
+                print(f"一致 [{variant}] {name}")
+                continue
+            differences = structural_diff(golden_html, current_html, args.ignore_template)
+            if not differences and not args.strict:
+                print(f"一致 [{variant}] {name}（结构相同，标记有差异）")
+                continue
+
+            failures += 1
+            print(f"不同 [{variant}] {name}")
+            for line in differences[:MAX_REPORTED_DIFFERENCES] or ["结构相同，标记有差异（--strict）"]:
+                print(f"    {line}")
+            if len(differences) > MAX_REPORTED_DIFFERENCES:
+                print(f"    ... 另有 {len(differences) - MAX_REPORTED_DIFFERENCES} 处差异")
+
+    print(f"\n检查完成: {failures} 个输出与金标准不同" if failures else "\n检查完成: 全部一致")
+    return 1 if failures else 0
+
+
+def build_arg_parser():
+    """golden 命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py golden", description="金标准输出回归检查")
+    parser.add_argument('action', choices=['record', 'check'])
+    parser.add_argument('--golden-dir', default=DEFAULT_GOLDEN_DIR, help="金标准目录 (默认: golden/)")
+    parser.add_argument('--variant', action='append', choices=VARIANTS,
+                        help="只处理指定版本（可重复，默认: 全部）")
+    parser.add_argument('--files', nargs='+', help="只处理这些输入文件（默认: 仓库语料 + 合成小说）")
+    parser.add_argument('--no-corpus', action='store_true', help="不包含仓库HTML语料（仓库中的金标准只含合成小说）")
+    parser.add_argument('--no-synthetic', action='store_true', help="不包含合成小说")
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE',
+                        help="传给 process_large_html_file 的选项，如 --set balance=size")
+    parser.add_argument('--strict', action='store_true', help="规范化后的HTML必须逐字节一致")
+    parser.add_argument('--ignore-template', action='store_true', help="不比较样式和脚本模板")
+    parser.add_argument('--engine', metavar='DIR',
+                        help="用该目录中的 xds.py/xds1.py 代替当前实现（如基线版本的 git worktree）")
+    return parser
+
+
+def main(argv=None):
+    """golden 入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    args.variant = args.variant or VARIANTS
+    sys.path.insert(0, REPO_DIR)
+    work_dir = os.path.join(tempfile.gettempdir(), 'xds-golden')
+    os.makedirs(work_dir, exist_ok=True)
+    options = parse_options(args.set)
+    for variant in args.variant:
+        unsupported = unsupported_options(variant, options, args.engine)
+        if unsupported:
+            print(f"错误: [{variant}] 不支持选项 {', '.join(unsupported)}")
+            return 2
+    if args.action == 'record':
+        return record(args, collect_inputs(args, work_dir), work_dir)
+    return check(args, collect_inputs(args, work_dir, recorded_inputs(args.golden_dir)), work_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
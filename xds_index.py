@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""书索引旁路文件 - 分章结果和位置倒排索引存成带版本的二进制文件，之后直接 mmap 使用
+
+生成页面时写在页面旁边（<输出文件名>.idx）:
+    python xds.py book.htm --index chapters     章节表 + 正文
+    python xds.py book.htm --index postings     另加全文 bigram 位置索引
+之后再生成同一本书时，源文件未变就直接取用其中的章节，跳过编码检测和分章；
+阅读服务（python xds.py serve）启动时映射同一文件；也可以直接查询:
+    python xds.py query book_search.idx 黄蓉 [-n 20]
+
+位置索引为全文相邻两字（bigram）的出现位置，查询为精确子串:
+    两字: 直接取该 bigram 的位置表
+    多字: 取查询中出现最少的 bigram 的位置表作为候选，再在正文上逐个核对
+    单字: 合并以该字开头的所有 bigram 的位置表
+
+文件格式（小端）:
+    头部      magic 'XDSB', 版本, 标志(1=含位置索引), 源文件大小, 源文件修改时间(ns), 源文件 SHA-1,
+              编码, 编码得分, 章节数, 全文字数, 正文字节数, bigram 数, 位置总数, 参数字节数
+    参数      构建参数（JSON）
+    章节表    (章节号 uint32, 起始字位置 uint32) × 章节数
+    标题      UTF-8，以 \\x00 分隔（前面 uint32 为字节数）
+    正文      各章正文以 \\x00 连接，UTF-8
+    （以下按 8 字节对齐，仅含位置索引时）
+    keys      uint64 × bigram 数          (第一字 << 21 | 第二字)，升序
+    offsets   uint64 × (bigram 数 + 1)    各 bigram 在 positions 中的起止
+    positions uint32 × 位置总数           全文中的字符位置，升序
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import heapq
+import struct
+import hashlib
+import argparse
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from itertools import islice
+from collections import defaultdict
+
+MAGIC = b'XDSB'
+
+# 格式版本，格式、正文拼接方式或分章结果改变时递增
+INDEX_VERSION = 2
+
+HEADER = struct.Struct('<4sHHQq20s16sdIQQQQI')
+
+FLAG_POSTINGS = 1
+
+# 章节之间的分隔符，不会出现在查询中，匹配不会跨章节
+CHAPTER_SEPARATOR = '\x00'
+
+# 全文末尾补一个字符，最后一个字也有以它开头的 bigram
+END_MARK = '\x00'
+
+# 查询结果中命中词前后保留的字数
+SNIPPET_CONTEXT = 30
+
+
+def bigram_key(pair):
+    return ord(pair[0]) << 21 | ord(pair[1])
+
+
+def sidecar_path(output_file):
+    """页面对应的索引文件"""
+    return os.path.splitext(output_file)[0] + '.idx'
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(partial(f.read, 1 << 20), b''):
+            sha1.update(block)
+    return sha1.digest()
+
+
+def build_postings(text):
+    """全文的 bigram 位置表，返回 (keys, offsets, [各 bigram 的位置表])"""
+    postings = defaultdict(partial(array, 'I'))
+    for position, pair in enumerate(map(operator.add, text, islice(text + END_MARK, 1, None))):
+        postings[pair].append(position)
+    pairs = sorted(postings, key=bigram_key)
+    keys = array('Q', map(bigram_key, pairs))
+    offsets = array('Q', [0])
+    for pair in pairs:
+        offsets.append(offsets[-1] + len(postings[pair]))
+    return keys, offsets, [postings[pair] for pair in pairs]
+
+
+def write_book_index(path, source, chapters, encoding=None, encoding_score=0.0, postings=False, settings=None):
+    """写入索引文件（先写临时文件再改名）
+
+    chapters: [(章节号, 标题, 正文), ...]，即分章（去重之前）的结果
+    settings: 记录在文件中的构建参数
+    """
+    source_stat = os.stat(source)
+    text = CHAPTER_SEPARATOR.join(chap_content for _, _, chap_content in chapters)
+    table, position = array('I'), 0
+    for chap_num, _, chap_content in chapters:
+        table.extend((chap_num, position))
+        position += len(chap_content) + len(CHAPTER_SEPARATOR)
+    titles = '\x00'.join(chap_title.replace('\x00', '') for _, chap_title, _ in chapters).encode('utf-8')
+    body = text.encode('utf-8')
+    keys, offsets, lists = build_postings(text) if postings else (array('Q'), array('Q', [0]), [])
+    settings = json.dumps(settings or {}, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, INDEX_VERSION, FLAG_POSTINGS if postings else 0, source_stat.st_size,
+                            source_stat.st_mtime_ns, file_sha1(source), (encoding or '').encode('ascii'),
+                            encoding_score or 0.0, len(chapters), len(text), len(body), len(keys), offsets[-1],
+                            len(settings)))
+        f.write(settings)
+        f.write(table.tobytes())
+        f.write(struct.pack('<I', len(titles)))
+        f.write(titles)
+        f.write(body)
+        if postings:
+            f.write(b'\x00' * (-f.tell() % 8))
+            f.write(keys.tobytes())
+            f.write(offsets.tobytes())
+            for positions in lists:
+                f.write(positions.tobytes())
+    os.replace(temp_path, path)
+    return path
+
+
+class BookIndex:
+    """映射到内存的索引文件：正文解码到内存，位置索引直接映射"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, flags, self.source_size, self.source_mtime_ns, self.source_sha1, encoding,
+             self.encoding_score, chapter_count, length, body_size, key_count, position_count,
+             settings_size) = HEADER.unpack_from(self.map)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != INDEX_VERSION:
+            self.map.close()
+            raise ValueError(f"不是可识别的索引文件或版本不同: {path}")
+        self.encoding = encoding.rstrip(b'\x00').decode('ascii') or None
+        self.has_postings = bool(flags & FLAG_POSTINGS)
+
+        start = HEADER.size
+        self.settings = json.loads(self.map[start:start + settings_size].decode('utf-8'))
+        start += settings_size
+        table = array('I', self.map[start:start + 8 * chapter_count])
+        self.numbers, self.starts = list(table[0::2]), list(table[1::2])
+        start += 8 * chapter_count
+        titles_size, = struct.unpack_from('<I', self.map, start)
+        start += 4
+        self.titles = self.map[start:start + titles_size].decode('utf-8').split('\x00') if chapter_count else []
+        start += titles_size
+        self.text = self.map[start:start + body_size].decode('utf-8')
+        start += body_size
+        if len(self.text) != length:
+            self.map.close()
+            raise ValueError(f"索引文件不完整: {path}")
+
+        self.view = memoryview(self.map)
+        start += -start % 8
+        self.keys = self.view[start:start + 8 * key_count].cast('Q')
+        start += 8 * key_count
+        self.offsets = self.view[start:start + 8 * (key_count + 1)].cast('Q') if self.has_postings else None
+        start += 8 * (key_count + 1)
+        self.positions = self.view[start:start + 4 * position_count].cast('I')
+
+    def matches(self, source):
+        """是否由当前的源文件生成：大小和修改时间一致，或内容的 SHA-1 一致"""
+        try:
+            source_stat = os.stat(source)
+        except OSError:
+            return False
+        if source_stat.st_size != self.source_size:
+            return False
+        return source_stat.st_mtime_ns == self.source_mtime_ns or file_sha1(source) == self.source_sha1
+
+    def chapter_end(self, i):
+        return self.starts[i + 1] - len(CHAPTER_SEPARATOR) if i + 1 < len(self.starts) else len(self.text)
+
+    def chapters(self):
+        """还原分章结果 [(章节号, 标题, 正文), ...]"""
+        return [(num, title, self.text[self.starts[i]:self.chapter_end(i)])
+                for i, (num, title) in enumerate(zip(self.numbers, self.titles))]
+
+    def chapter(self, position):
+        """位置所在章节的 (章节号, 标题, 章节起点, 章节终点)"""
+        i = bisect_right(self.starts, position) - 1
+        return self.numbers[i], self.titles[i], self.starts[i], self.chapter_end(i)
+
+    def postings(self, pair):
+        """某个 bigram 的位置表"""
+        key = bigram_key(pair)
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.positions[0:0]
+        return self.positions[self.offsets[i]:self.offsets[i + 1]]
+
+    def char_postings(self, char):
+        """以该字开头的所有 bigram 的位置表"""
+        first = bisect_left(self.keys, ord(char) << 21)
+        last = bisect_left(self.keys, (ord(char) + 1) << 21)
+        return [self.positions[self.offsets[i]:self.offsets[i + 1]] for i in range(first, last)]
+
+    def find(self, query):
+        """按位置顺序逐个给出 query 在全文中出现的位置（可能重叠）；没有位置索引时逐个查找"""
+        if not query:
+            return
+        if not self.has_postings:
+            position = self.text.find(query)
+            while position >= 0:
+                yield position
+                position = self.text.find(query, position + 1)
+            return
+        if len(query) == 1:
+            yield from heapq.merge(*self.char_postings(query))
+            return
+        if len(query) == 2:
+            yield from self.postings(query)
+            return
+        # 出现最少的 bigram 作为候选，减去它在查询中的偏移即为起点
+        shift, candidates = min(((i, self.postings(query[i:i + 2])) for i in range(len(query) - 1)),
+                                key=lambda item: len(item[1]))
+        startswith = self.text.startswith
+        for position in candidates:
+            if position >= shift and startswith(query, position - shift):
+                yield position - shift
+
+    def close(self):
+        for view in (self.keys, self.offsets, self.positions, self.view):
+            if view is not None:
+                view.release()
+        self.map.close()
+
+
+def open_book_index(path, source, postings=False):
+    """索引文件存在、由当前源文件生成且含所需部分时返回 BookIndex，否则返回 None"""
+    try:
+        book_index = BookIndex(path)
+    except (OSError, ValueError):
+        return None
+    if book_index.matches(source) and (book_index.has_postings or not postings):
+        return book_index
+    book_index.close()
+    return None
+
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py query", description="在 --index 生成的索引文件中查找子串")
+    parser.add_argument('path', help="索引文件（.idx）")
+    parser.add_argument('query', help="查询的子串（精确匹配）")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="显示的命中数 (默认: 20)")
+    return parser
+
+
+def main(argv=None):
+    """索引文件查询入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    try:
+        book_index = BookIndex(args.path)
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法读取 '{args.path}': {e}")
+        return 1
+    start_time = time.perf_counter()
+    positions, previous_end = [], 0
+    for position in book_index.find(args.query):
+        if position >= previous_end:
+            positions.append(position)
+            previous_end = position + len(args.query)
+    elapsed = (time.perf_counter() - start_time) * 1000
+
+    method = '位置索引' if book_index.has_postings else '逐字查找'
+    print(f'"{args.query}" 出现 {len(positions)} 次（{method}，{elapsed:.1f} ms）')
+    text = book_index.text
+    for position in positions[:args.limit]:
+        chap_num, chap_title, chap_start, chap_end = book_index.chapter(position)
+        start = max(chap_start, position - SNIPPET_CONTEXT)
+        end = min(chap_end, position + len(args.query) + SNIPPET_CONTEXT)
+        excerpt = text[start:position] + f'【{args.query}】' + text[position + len(args.query):end]
+        print(f"  #chap-{chap_num} {chap_title}: {excerpt.replace(chr(10), ' ')}")
+    book_index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""书库模式 - 批量生成各书页面，再生成书库目录页和按词分片的跨书 n-gram 索引
+
+用法:
+    python xds.py library books/ -o site/ [-j 4] [--shard-size 256]
+
+输出:
+    site/<书名>_search.html        各书页面（与 batch 相同，跳过已是最新的）
+    site/index.html                书库目录页，搜索框跨书搜索
+    site/index/shards.json         分片清单: 每个分片覆盖的词范围、书目
+    site/index/shards/NNNN.json    倒排分片: {两字词: {书号: [章节序号差分...]}}
+    site/index/books/<书号>.json   各书章节列表（命中后才加载）
+    site/index/terms/<书名>.json.gz  各书的词表（合并分片用的中间结果，不需要发布）
+
+目录页搜索时只下载查询词所在的分片，结果是包含全部两字词的章节（候选，未核对相邻），
+点击进入该书页面的章节锚点。需要通过 HTTP 访问（GitHub Pages 或 python -m http.server）。
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import html
+import argparse
+from pathlib import Path
+
+import xds
+
+# 索引格式版本，格式改变时递增
+INDEX_VERSION = 1
+
+# 每个分片的目标大小（字节，未压缩 JSON）
+DEFAULT_SHARD_SIZE = 256 * 1024
+
+# 索引的词：连续中文字符按相邻两字，其余按英文单词/数字（小写）
+CJK_RUN_PATTERN = re.compile(r'[㐀-鿿豈-﫿]+')
+WORD_PATTERN = re.compile(r'[A-Za-z0-9]{2,}')
+
+
+def chapter_terms(text):
+    """章节中出现的词（集合）"""
+    terms = {word.lower() for word in WORD_PATTERN.findall(text)}
+    for run in CJK_RUN_PATTERN.findall(text):
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def book_key(input_file):
+    """书在索引目录中的文件名（与输出页面同名规则）
+
+    只取文件名主干，不同目录下的同名书会冲突：页面写在同一输出目录，process_batch 已拒绝
+    输出重名的书（见 xds.output_collisions），build_catalog 也只收录同名书中的第一本
+    """
+    return Path(input_file).stem
+
+
+def write_book_index(catalog_dir, input_file, output_file, chapters):
+    """处理流程中的书库阶段：写出一本书的章节列表和词表
+
+    chapters: [(章节号, 标题, 正文), ...]
+    """
+    terms_dir = os.path.join(catalog_dir, 'terms')
+    os.makedirs(terms_dir, exist_ok=True)
+    postings = {}
+    for index, (_, chap_title, chap_content) in enumerate(chapters):
+        for term in chapter_terms(chap_title + '\n' + chap_content):
+            postings.setdefault(term, []).append(index)
+    book = {
+        'title': book_key(input_file),
+        'file': os.path.basename(output_file),
+        'chapters': [[chap_num, chap_title] for chap_num, chap_title, _ in chapters],
+        'terms': postings,
+    }
+    with gzip.open(os.path.join(terms_dir, book_key(input_file) + '.json.gz'), 'wt', encoding='utf-8') as f:
+        json.dump(book, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def delta_encode(indexes):
+    """升序章节序号转差分，缩小分片"""
+    return [value - previous for previous, value in zip([0] + indexes, indexes)]
+
+
+def build_shards(books, index_dir, shard_size=DEFAULT_SHARD_SIZE):
+    """合并各书词表，按词排序后切成大小相近的分片，返回 [(起始词, 分片文件名), ...]"""
+    merged = {}
+    for book_id, book in enumerate(books):
+        for term, indexes in book['terms'].items():
+            merged.setdefault(term, {})[book_id] = delta_encode(indexes)
+
+    shard_dir = os.path.join(index_dir, 'shards')
+    os.makedirs(shard_dir, exist_ok=True)
+    for old in os.listdir(shard_dir):
+        os.remove(os.path.join(shard_dir, old))
+
+    shards = []
+    current, current_size = {}, 0
+
+    def flush():
+        name = f"{len(shards):04d}.json"
+        with open(os.path.join(shard_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, separators=(',', ':'))
+        shards.append((next(iter(current)), name))
+
+    for term in sorted(merged):
+        entry = merged[term]
+        size = len(term.encode('utf-8')) + sum(8 + 4 * len(indexes) for indexes in entry.values())
+        # 同一个词的倒排不跨分片，分片之间按词的范围划分
+        if current and current_size + size > shard_size:
+            flush()
+            current, current_size = {}, 0
+        current[term] = entry
+        current_size += size
+    if current:
+        flush()
+    return shards
+
+
+def build_catalog(output_dir, input_files, shard_size=DEFAULT_SHARD_SIZE):
+    """根据各书词表生成分片、书目和目录页，返回收录的书数"""
+    index_dir = os.path.join(output_dir, 'index')
+    books = []
+    keys = {}
+    for input_file in sorted(input_files):
+        if book_key(input_file) in keys:
+            print(f"跳过（与 {keys[book_key(input_file)]} 同名）: {input_file}")
+            continue
+        keys[book_key(input_file)] = input_file
+        terms_file = os.path.join(index_dir, 'terms', book_key(input_file) + '.json.gz')
+        try:
+            with gzip.open(terms_file, 'rt', encoding='utf-8') as f:
+                books.append(json.load(f))
+        except (OSError, ValueError):
+            print(f"跳过（没有词表）: {input_file}")
+
+    shards = build_shards(books, index_dir, shard_size)
+
+    books_dir = os.path.join(index_dir, 'books')
+    os.makedirs(books_dir, exist_ok=True)
+    for book_id, book in enumerate(books):
+        with open(os.path.join(books_dir, f"{book_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(book['chapters'], f, ensure_ascii=False, separators=(',', ':'))
+
+    manifest = {
+        'version': INDEX_VERSION,
+        'shards': shards,
+        'books': [{'title': book['title'], 'file': book['file'], 'chapters': len(book['chapters'])}
+                  for book in books],
+    }
+    with open(os.path.join(index_dir, 'shards.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(render_catalog(manifest['books']))
+    print(f"书库目录: {os.path.join(output_dir, 'index.html')} ({len(books)} 本书, {len(shards)} 个索引分片)")
+    return len(books)
+
+
+def render_catalog(books):
+    """书库目录页"""
+    items = ''.join(f'\n<li><a href="{html.escape(book["file"])}">{html.escape(book["title"])}</a>'
+                    f'<span class="count">{book["chapters"]} 章</span></li>' for book in books)
+    return CATALOG_TEMPLATE.replace('{book_count}', str(len(books))).replace('{book_list}', items)
+
+
+CATALOG_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>书库 - 全文搜索</title>
+<style>
+body {
+    font-family: "Microsoft YaHei", "PingFang SC", sans-serif;
+    margin: 0;
+    background: #f5f5f5;
+    color: #333;
+}
+.header {
+    position: sticky;
+    top: 0;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    padding: 8px 15px;
+}
+.header input {
+    width: 100%;
+    box-sizing: border-box;
+    padding: 8px 12px;
+    font-size: 16px;
+    border: none;
+    border-radius: 4px;
+}
+.stats {
+    font-size: 13px;
+    margin-top: 4px;
+    min-height: 16px;
+}
+.results, .books {
+    margin: 10px;
+    padding: 0;
+    list-style: none;
+}
+.results > li, .books > li {
+    background: white;
+    margin-bottom: 6px;
+    padding: 8px 12px;
+    border-radius: 4px;
+}
+.results a, .books a {
+    color: #d4380d;
+    text-decoration: none;
+}
+.results .chapters a {
+    display: inline-block;
+    margin: 2px 8px 2px 0;
+    color: #2980B9;
+    font-size: 14px;
+}
+.count {
+    float: right;
+    color: #999;
+    font-size: 13px;
+}
+</style>
+</head>
+<body>
+<div class="header">
+    <input type="text" id="searchInput" placeholder="跨书搜索（至少两个字）... 共 {book_count} 本书">
+    <div id="searchStats" class="stats"></div>
+</div>
+<ul id="results" class="results"></ul>
+<ul id="books" class="books">{book_list}
+</ul>
+<script>
+// 分片按需加载，同一分片只下载一次
+const shardCache = new Map();
+const bookCache = new Map();
+let manifestPromise = null;
+
+function fetchJSON(url, cache) {
+    if (!cache.has(url)) {
+        cache.set(url, fetch(url).then(response => response.json()));
+    }
+    return cache.get(url);
+}
+
+function loadManifest() {
+    manifestPromise = manifestPromise || fetch('index/shards.json').then(response => response.json());
+    return manifestPromise;
+}
+
+// 与生成索引时相同的切词：中文相邻两字，英文单词/数字（小写）
+function queryTerms(query) {
+    const terms = new Set();
+    (query.match(/[A-Za-z0-9]{2,}/g) || []).forEach(word => terms.add(word.toLowerCase()));
+    (query.match(/[\\u3400-\\u9fff\\uf900-\\ufaff]+/g) || []).forEach(run => {
+        for (let i = 0; i + 1 < run.length; i++) {
+            terms.add(run.slice(i, i + 2));
+        }
+    });
+    return [...terms];
+}
+
+// 词所在的分片：分片按起始词排序，取最后一个起始词不大于它的分片
+function shardFor(shards, term) {
+    let low = 0, high = shards.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (shards[mid][0] <= term) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    return low > 0 ? shards[low - 1][1] : null;
+}
+
+// 某个词的倒排 {书号: Set(章节序号)}
+async function postings(manifest, term) {
+    const shard = shardFor(manifest.shards, term);
+    const entries = shard ? (await fetchJSON('index/shards/' + shard, shardCache))[term] : null;
+    const result = new Map();
+    Object.entries(entries || {}).forEach(([bookId, deltas]) => {
+        let value = 0;
+        result.set(Number(bookId), new Set(deltas.map(delta => (value += delta))));
+    });
+    return result;
+}
+
+async function searchLibrary() {
+    const query = document.getElementById('searchInput').value.trim();
+    const stats = document.getElementById('searchStats');
+    const results = document.getElementById('results');
+    const terms = queryTerms(query);
+    results.innerHTML = '';
+    document.getElementById('books').style.display = terms.length ? 'none' : '';
+    if (!terms.length) {
+        stats.textContent = query ? '请输入至少两个字' : '';
+        return;
+    }
+
+    const manifest = await loadManifest();
+    const lists = await Promise.all(terms.map(term => postings(manifest, term)));
+    // 各词倒排求交：先从最短的开始
+    lists.sort((a, b) => a.size - b.size);
+    const matches = new Map();
+    lists[0].forEach((chapters, bookId) => {
+        let common = [...chapters];
+        for (const list of lists.slice(1)) {
+            const other = list.get(bookId);
+            common = other ? common.filter(index => other.has(index)) : [];
+        }
+        if (common.length) {
+            matches.set(bookId, common);
+        }
+    });
+    if (query !== document.getElementById('searchInput').value.trim()) {
+        return;
+    }
+
+    const ranked = [...matches.entries()].sort((a, b) => b[1].length - a[1].length);
+    const chapterCount = ranked.reduce((sum, [, chapters]) => sum + chapters.length, 0);
+    stats.textContent = ranked.length
+        ? `"${query}" 可能出现在 ${ranked.length} 本书的 ${chapterCount} 个章节中`
+        : `未找到包含 "${query}" 的章节`;
+
+    for (const [bookId, chapters] of ranked.slice(0, 50)) {
+        const book = manifest.books[bookId];
+        const titles = await fetchJSON(`index/books/${bookId}.json`, bookCache);
+        const item = document.createElement('li');
+        const links = chapters.slice(0, 30).map(index => {
+            const [num, title] = titles[index];
+            const link = document.createElement('a');
+            link.href = `${encodeURI(book.file)}#chap-${num}`;
+            link.textContent = title;
+            return link.outerHTML;
+        }).join('');
+        item.innerHTML = `<a href="${encodeURI(book.file)}"></a><span class="count">${chapters.length} 章</span>` +
+            `<div class="chapters">${links}${chapters.length > 30 ? ' …' : ''}</div>`;
+        item.firstChild.textContent = book.title;
+        results.appendChild(item);
+    }
+}
+
+let searchTimer;
+document.getElementById('searchInput').addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(searchLibrary, 300);
+});
+</script>
+</body>
+</html>
+'''
+
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py library", description="生成书库：各书页面 + 目录页 + 跨书分片索引")
+    parser.add_argument('targets', nargs='+', help="输入目录、文件或通配符")
+    parser.add_argument('-o', '--output-dir', default='library', help="书库输出目录 (默认: library)")
+    parser.add_argument('-j', '--jobs', type=int, help="并行进程数（默认: CPU核数）")
+    parser.add_argument('--force', action='store_true', help="忽略已是最新的输出，全部重新生成")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE // 1024,
+                        help=f"索引分片目标大小 KB (默认: {DEFAULT_SHARD_SIZE // 1024})")
+    xds.add_pipeline_arguments(parser)
+    return parser
+
+
+def main(argv=None, default_profile='default'):
+    """library 入口，返回进程退出码"""
+    parser = build_arg_parser()
+    parser.set_defaults(profile=default_profile)
+    args = parser.parse_args(argv)
+    options = xds.pipeline_options(args)
+    options['catalog_dir'] = os.path.join(os.path.abspath(args.output_dir), 'index')
+
+    rows = xds.process_batch(args.targets, options, args.output_dir, args.jobs, args.force)
+    built = [row[0] for row in rows if row[1] != '失败']
+    if not built:
+        return 1
+    build_catalog(args.output_dir, built, args.shard_size * 1024)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""本地阅读服务 - asyncio + 标准库 HTTP 服务，章节按需加载
+
+用法:
+    python xds.py serve books/ [--port 8000] [-j 4] [--index-dir DIR]
+
+启动时读入各书（编码检测、分章），内存中只保留每本书的全文、章节偏移表和目录；
+分章结果和 bigram 位置索引存在各书的 .idx 索引文件中（见 xds_index，位置与 batch 生成的页面相同），
+第一次启动时建好，之后源文件未变就直接映射索引文件，不再读取源文件；
+浏览器先拿到很小的阅读页，再按需请求章节和搜索结果（JSON）:
+    GET /                                 书目
+    GET /book/<书号>                       阅读页（目录 + 搜索框，正文按需加载）
+    GET /api/books                        书目 JSON
+    GET /api/book/<书号>                   目录 JSON: [[章节号, 标题, 字数], ...]
+    GET /api/book/<书号>/chapter/<章节号>   章节 JSON: {num, title, paragraphs}
+    GET /api/book/<书号>/search?q=&offset=&limit=   搜索 JSON: {total, hits: [{chapter, title, snippet}]}
+响应带 ETag，支持 If-None-Match（304）；客户端接受 gzip 时返回预先压缩好的内容。
+"""
+
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import contextlib
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import xds
+import xds_index
+
+# 已生成响应的缓存条数（章节、目录等，含压缩结果）
+RESPONSE_CACHE_SIZE = 4096
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_SIZE = 1024
+
+# 空闲连接保持秒数
+KEEP_ALIVE_TIMEOUT = 15
+
+# 单次搜索最多统计的命中数，超过只报告下限
+MAX_SEARCH_HITS = 10000
+
+# 搜索摘要中命中词前后保留的字数
+SNIPPET_CONTEXT = 30
+
+# 无索引搜索每次 str.find 扫描的字数：搜索在线程中运行，单次调用不长时间占住 GIL，其他连接照常响应
+SCAN_CHUNK = 1 << 20
+
+# 章节之间的分隔符，避免跨章节的匹配
+CHAPTER_SEPARATOR = '\x00'
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def load_book(path, index_dir=None, use_index=True):
+    """读入一本书（在子进程中运行）
+
+    use_index 时索引文件与源文件一致就不再读取源文件，否则读取、分章后重建索引文件，
+    返回索引文件路径，由主进程映射；否则返回分章结果
+    """
+    index_file = xds_index.sidecar_path(xds.batch_output_file(path, index_dir)) if use_index else None
+    if index_file:
+        book_index = xds_index.open_book_index(index_file, path, postings=True)
+        if book_index:
+            book_index.close()
+            return {'index_file': index_file, 'index_built': False}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        content = xds.read_file_smart_encoding(path)
+        if content is None:
+            return None
+        chapters = xds.extract_chapters(content) or list(xds.split_into_pages(content))
+    if not index_file:
+        return {'chapters': chapters}
+    encoding, score = xds.ENCODING_HINTS.get(os.path.abspath(path), (None, 0.0))
+    xds_index.write_book_index(index_file, path, chapters, encoding, score, postings=True,
+                               settings={'postings': True})
+    return {'index_file': index_file, 'index_built': True}
+
+
+def open_book(path, loaded):
+    """书目信息、目录、全文和章节偏移表；有索引文件时从中映射"""
+    book = {
+        'title': os.path.splitext(os.path.basename(path))[0],
+        'source': os.path.abspath(path),
+        'index': None,
+    }
+    if loaded.get('index_file'):
+        book_index = xds_index.BookIndex(loaded['index_file'])
+        book['index'] = book_index
+        book['text'], book['starts'] = book_index.text, book_index.starts
+        book['toc'] = [[chap_num, chap_title, book_index.chapter_end(i) - book_index.starts[i]]
+                       for i, (chap_num, chap_title) in enumerate(zip(book_index.numbers, book_index.titles))]
+        return book
+
+    chapters = loaded['chapters']
+    starts, position = [], 0
+    for _, _, chap_content in chapters:
+        starts.append(position)
+        position += len(chap_content) + len(CHAPTER_SEPARATOR)
+    book['text'] = CHAPTER_SEPARATOR.join(chap_content for _, _, chap_content in chapters)
+    book['starts'] = starts
+    book['toc'] = [[chap_num, chap_title, len(chap_content)] for chap_num, chap_title, chap_content in chapters]
+    return book
+
+
+def load_library(targets, jobs=None, index_dir=None, use_index=True):
+    """并行读入所有书，返回书列表（顺序即书号）"""
+    input_files = xds.collect_input_files(targets)
+    # 索引文件与前面的书重名（如 a.htm 和 a.html）时这本书不用索引，免得互相覆盖
+    collisions = xds.output_collisions(input_files, index_dir) if use_index else {}
+    use_indexes = [use_index and path not in collisions for path in input_files]
+    books = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for path, loaded in zip(input_files, executor.map(load_book, input_files, repeat(index_dir), use_indexes)):
+            if loaded is None:
+                print(f"跳过（无法读取）: {path}")
+                continue
+            book = open_book(path, loaded)
+            if path in collisions:
+                note = f", 索引文件与 {collisions[path]} 重名，不用索引"
+            elif not loaded.get('index_file'):
+                note = ''
+            elif loaded['index_built']:
+                note = f", 新建索引 {loaded['index_file']}"
+            else:
+                note = f", 沿用索引 {loaded['index_file']}"
+            print(f"已载入: {path} ({len(book['toc'])} 章{note})")
+            books.append(book)
+    return books
+
+
+def find_all(text, query):
+    """没有索引时逐个查找子串（按 SCAN_CHUNK 分块扫描）"""
+    start = 0
+    while start < len(text):
+        # 块尾多留 len(query) - 1 个字，跨块的匹配也能找到
+        position = text.find(query, start, start + SCAN_CHUNK + len(query) - 1)
+        if position < 0:
+            start += SCAN_CHUNK
+            continue
+        yield position
+        start = position + 1
+
+
+def chapter_text(book, index):
+    """目录中第 index 个章节的正文"""
+    start = book['starts'][index]
+    end = book['starts'][index + 1] - len(CHAPTER_SEPARATOR) if index + 1 < len(book['starts']) else len(book['text'])
+    return book['text'][start:end]
+
+
+def search_book(book, query, offset=0, limit=50):
+    """查找子串（不重叠），按出现顺序分页返回命中（章节号、标题、摘要）"""
+    text, starts, toc = book['text'], book['starts'], book['toc']
+    positions = book['index'].find(query) if book.get('index') else find_all(text, query)
+    hits, total, previous_end, truncated = [], 0, 0, False
+    for position in positions:
+        if position < previous_end:
+            continue
+        if total == MAX_SEARCH_HITS:
+            truncated = True
+            break
+        if offset <= total < offset + limit:
+            index = bisect_right(starts, position) - 1
+            chapter_end = starts[index + 1] - 1 if index + 1 < len(starts) else len(text)
+            start = max(starts[index], position - SNIPPET_CONTEXT)
+            end = min(chapter_end, position + len(query) + SNIPPET_CONTEXT)
+            hits.append({
+                'chapter': toc[index][0],
+                'title': toc[index][1],
+                'snippet': text[start:end],
+                'match': position - start,
+            })
+        total += 1
+        previous_end = position + len(query)
+    return {'query': query, 'total': total, 'truncated': truncated, 'offset': offset, 'hits': hits}
+
+
+def make_response(body, content_type):
+    """生成可缓存的响应：正文、gzip 压缩结果和 ETag"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    compressed = gzip.compress(body, 6) if len(body) >= GZIP_MIN_SIZE else None
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    return {'type': content_type, 'body': body, 'gzip': compressed, 'etag': etag}
+
+
+def json_response(data):
+    return make_response(json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+                         'application/json; charset=utf-8')
+
+
+class Library:
+    """路由和响应缓存"""
+
+    def __init__(self, books):
+        self.books = books
+        self.cache = OrderedDict()
+
+    def cached(self, key, build):
+        """取缓存的响应，没有则生成并缓存（LRU）"""
+        response = self.cache.get(key)
+        if response is None:
+            response = build()
+            if response is None:
+                return None
+            self.cache[key] = response
+            if len(self.cache) > RESPONSE_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return response
+
+    def book(self, book_id):
+        return self.books[int(book_id)] if book_id.isdigit() and int(book_id) < len(self.books) else None
+
+    async def route(self, path, query):
+        """返回响应，找不到返回 None；搜索在线程池中运行，不阻塞其他连接"""
+        parts = [unquote(part) for part in path.strip('/').split('/')] if path.strip('/') else []
+        if not parts:
+            return self.cached('/', lambda: make_response(render_index(self.books), 'text/html; charset=utf-8'))
+        if parts == ['api', 'books']:
+            return self.cached('/api/books', lambda: json_response(
+                [{'id': i, 'title': book['title'], 'chapters': len(book['toc'])} for i, book in enumerate(self.books)]))
+        if len(parts) == 2 and parts[0] == 'book' and self.book(parts[1]):
+            book = self.book(parts[1])
+            return self.cached(path, lambda: make_response(
+                READER_TEMPLATE.replace('{title}', xds.escape_html(book['title'])).replace('{book_id}', parts[1]),
+                'text/html; charset=utf-8'))
+        if len(parts) < 3 or parts[:2] != ['api', 'book'] or not self.book(parts[2]):
+            return None
+
+        book = self.book(parts[2])
+        if len(parts) == 3:
+            return self.cached(path, lambda: json_response({'title': book['title'], 'toc': book['toc']}))
+        if len(parts) == 5 and parts[3] == 'chapter':
+            return self.cached(path, lambda: self.chapter_response(book, parts[4]))
+        if len(parts) == 4 and parts[3] == 'search':
+            text = query.get('q', [''])[0]
+            if not text:
+                return json_response({'query': '', 'total': 0, 'truncated': False, 'offset': 0, 'hits': []})
+            offset = int(query.get('offset', ['0'])[0] or 0)
+            limit = min(int(query.get('limit', ['50'])[0] or 50), 200)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: json_response(search_book(book, text, offset, limit)))
+        return None
+
+    def chapter_response(self, book, chap_num):
+        """章节 JSON，段落切分与生成页面一致"""
+        numbers = [entry[0] for entry in book['toc']]
+        if not chap_num.isdigit() or int(chap_num) not in numbers:
+            return None
+        index = numbers.index(int(chap_num))
+        return json_response({
+            'num': int(chap_num),
+            'title': book['toc'][index][1],
+            'paragraphs': list(xds.smart_split(chapter_text(book, index))),
+        })
+
+    async def handle(self, reader, writer):
+        """处理一个连接上的请求（HTTP/1.1 keep-alive）"""
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if method not in ('GET', 'HEAD'):
+                    response, status = make_response('', 'text/plain'), 405
+                else:
+                    url = urlsplit(target)
+                    try:
+                        response = await self.route(url.path, parse_qs(url.query))
+                        status = 200 if response else 404
+                    except ValueError:
+                        response, status = None, 400
+                    response = response or make_response(STATUS_TEXT[status], 'text/plain; charset=utf-8')
+                writer.write(self.encode(response, status, method, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def encode(response, status, method, headers, keep_alive):
+        """按 If-None-Match / Accept-Encoding 生成响应字节"""
+        lines = [f"Content-Type: {response['type']}", f"ETag: {response['etag']}", 'Vary: Accept-Encoding',
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        body = response['body']
+        if status == 200 and headers.get('if-none-match') == response['etag']:
+            status, body = 304, b''
+        elif response['gzip'] is not None and 'gzip' in headers.get('accept-encoding', ''):
+            body = response['gzip']
+            lines.append('Content-Encoding: gzip')
+        lines.append(f"Content-Length: {len(body)}")
+        head = f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n" + '\r\n'.join(lines) + '\r\n\r\n'
+        return head.encode('latin-1') + (b'' if method == 'HEAD' else body)
+
+
+def render_index(books):
+    """书目页"""
+    items = ''.join(f'\n<li><a href="/book/{i}">{xds.escape_html(book["title"])}</a>'
+                    f'<span class="count">{len(book["toc"])} 章</span></li>' for i, book in enumerate(books))
+    return INDEX_TEMPLATE.replace('{book_list}', items)
+
+
+PAGE_STYLE = '''<style>
+body {
+    font-family: "Microsoft YaHei", "PingFang SC", sans-serif;
+    margin: 0;
+    background: #f5f5f5;
+    color: #333;
+}
+.header {
+    position: sticky;
+    top: 0;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    padding: 6px 15px;
+    z-index: 1;
+}
+.header a {
+    color: white;
+}
+.header input {
+    width: 100%;
+    box-sizing: border-box;
+    padding: 6px 10px;
+    font-size: 16px;
+    border: none;
+    border-radius: 4px;
+}
+.stats {
+    font-size: 13px;
+    min-height: 16px;
+}
+ul {
+    margin: 10px;
+    padding: 0;
+    list-style: none;
+}
+li {
+    background: white;
+    margin-bottom: 4px;
+    padding: 6px 12px;
+    border-radius: 4px;
+}
+li a {
+    color: #d4380d;
+    text-decoration: none;
+}
+.count {
+    float: right;
+    color: #999;
+    font-size: 13px;
+}
+.chapter {
+    background: white;
+    margin: 10px;
+    padding: 10px 15px;
+    border-radius: 4px;
+    font-size: 22px;
+}
+.chapter h2 {
+    color: #d4380d;
+    font-size: 18px;
+}
+.chapter p {
+    text-indent: 2em;
+    line-height: 1.5;
+    text-align: justify;
+}
+mark {
+    background: #ffeb3b;
+}
+</style>'''
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>书库</title>
+''' + PAGE_STYLE + '''
+</head>
+<body>
+<div class="header">书库</div>
+<ul>{book_list}
+</ul>
+</body>
+</html>
+'''
+
+READER_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}</title>
+''' + PAGE_STYLE + '''
+</head>
+<body>
+<div class="header">
+    <a href="/">书库</a> / {title}
+    <input type="text" id="searchInput" placeholder="搜索本书...">
+    <div id="searchStats" class="stats"></div>
+</div>
+<ul id="results"></ul>
+<div id="chapter"></div>
+<ul id="toc"></ul>
+<script>
+const api = '/api/book/{book_id}';
+
+function escapeHTML(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// 目录
+fetch(api).then(response => response.json()).then(book => {
+    document.getElementById('toc').innerHTML = book.toc.map(([num, title, length]) =>
+        `<li><a href="#chap-${num}">${escapeHTML(title)}</a><span class="count">${length} 字</span></li>`).join('');
+    showChapter();
+});
+
+// 章节正文按需加载
+async function showChapter() {
+    const match = /^#chap-(\\d+)$/.exec(location.hash);
+    const box = document.getElementById('chapter');
+    if (!match) {
+        box.innerHTML = '';
+        return;
+    }
+    const chapter = await (await fetch(`${api}/chapter/${match[1]}`)).json();
+    box.innerHTML = `<div class="chapter"><h2>${escapeHTML(chapter.title)}</h2>` +
+        chapter.paragraphs.map(p => `<p>${escapeHTML(p)}</p>`).join('') + '</div>';
+    box.scrollIntoView();
+}
+window.addEventListener('hashchange', showChapter);
+
+// 服务端搜索
+let searchTimer;
+document.getElementById('searchInput').addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(async () => {
+        const query = document.getElementById('searchInput').value.trim();
+        const results = document.getElementById('results');
+        const stats = document.getElementById('searchStats');
+        if (!query) {
+            results.innerHTML = '';
+            stats.textContent = '';
+            return;
+        }
+        const data = await (await fetch(`${api}/search?q=${encodeURIComponent(query)}&limit=100`)).json();
+        stats.textContent = `找到 ${data.total}${data.truncated ? '+' : ''} 处`;
+        results.innerHTML = data.hits.map(hit => {
+            const before = escapeHTML(hit.snippet.slice(0, hit.match));
+            const found = escapeHTML(hit.snippet.slice(hit.match, hit.match + query.length));
+            const after = escapeHTML(hit.snippet.slice(hit.match + query.length));
+            return `<li><a href="#chap-${hit.chapter}">${escapeHTML(hit.title)}</a><br>` +
+                `${before}<mark>${found}</mark>${after}</li>`;
+        }).join('');
+    }, 300);
+});
+</script>
+</body>
+</html>
+'''
+
+
+async def serve(books, host, port):
+    """启动服务并一直运行"""
+    library = Library(books)
+    server = await asyncio.start_server(library.handle, host, port, backlog=1024)
+    print(f"阅读服务: http://{host}:{port}/ ({len(books)} 本书)")
+    async with server:
+        await server.serve_forever()
+
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py serve", description="本地阅读服务：章节按需加载、服务端搜索")
+    parser.add_argument('targets', nargs='+', help="输入目录、文件或通配符")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="端口 (默认: 8000)")
+    parser.add_argument('-j', '--jobs', type=int, help="启动时并行读入的进程数（默认: CPU核数）")
+    parser.add_argument('--index-dir', metavar='DIR',
+                        help="索引文件目录，与 batch 的 -o 相同即可共用其 --index postings 生成的索引（默认: 与源文件相同）")
+    parser.add_argument('--no-index', action='store_true', help="不建索引，搜索时逐字扫描全文")
+    return parser
+
+
+def main(argv=None):
+    """serve 入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    start_time = time.time()
+    books = load_library(args.targets, args.jobs, args.index_dir, not args.no_index)
+    if not books:
+        print("未找到可读取的书")
+        return 1
+    print(f"载入完成: {len(books)} 本书，用时 {time.time() - start_time:.1f} 秒")
+    try:
+        asyncio.run(serve(books, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""后缀数组 - 生成页面时对全书正文建后缀数组，写成旁路文件，任意子串都能精确查到全部位置
+
+生成（可与批量模式一起用）:
+    python xds.py book.htm --suffix-array
+    → 页面旁边写入 book_search.sa
+查询:
+    python xds.py query book_search.sa 黄蓉 [-n 20]
+
+中文没有词边界，分词索引回答不了任意子串；后缀数组按字典序排好全文的每个后缀，
+查询词出现的位置恰好是其中连续的一段，二分两次即可定位，O(m log n)。
+构建用 SA-IS（线性时间，纯 Python，约每百万字数秒）。
+
+文件格式（小端）:
+    头部  magic 'XDSA', 版本, 章节数, 全文字数, 正文 UTF-8 字节数
+    章节表  (章节号 uint32, 起始字位置 uint32) × 章节数，标题为 UTF-8，以 \\x00 分隔紧随其后
+    正文  各章正文以 \\x00 连接，UTF-8
+    后缀数组  uint32 × 全文字数
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+from array import array
+from bisect import bisect_right
+
+MAGIC = b'XDSA'
+
+# 文件格式版本，格式或正文拼接方式改变时递增
+SUFFIX_ARRAY_VERSION = 1
+
+HEADER = struct.Struct('<4sHHIIQ')
+
+# 章节之间的分隔符，不会出现在查询中，匹配不会跨章节
+CHAPTER_SEPARATOR = '\x00'
+
+# 查询结果中命中词前后保留的字数
+SNIPPET_CONTEXT = 30
+
+
+def sa_is(s, upper):
+    """SA-IS 构建后缀数组；s 为 0..upper 的整数列表"""
+    n = len(s)
+    if n == 0:
+        return []
+    if n == 1:
+        return [0]
+    if n == 2:
+        return [0, 1] if s[0] < s[1] else [1, 0]
+
+    # ls[i]: 后缀 i 是否为 S 型（比后一个后缀小）
+    ls = [False] * n
+    for i in range(n - 2, -1, -1):
+        ls[i] = ls[i + 1] if s[i] == s[i + 1] else s[i] < s[i + 1]
+
+    # 每个字符的桶：L 型从桶头放，S 型从桶尾放
+    sum_l = [0] * (upper + 2)
+    sum_s = [0] * (upper + 2)
+    for i in range(n):
+        if ls[i]:
+            sum_l[s[i] + 1] += 1
+        else:
+            sum_s[s[i]] += 1
+    for i in range(upper + 1):
+        sum_s[i] += sum_l[i]
+        sum_l[i + 1] += sum_s[i]
+
+    sa = [-1] * n
+
+    def induce(lms):
+        sa[:] = [-1] * n
+        buf = sum_s[:]
+        for d in lms:
+            if d != n:
+                sa[buf[s[d]]] = d
+                buf[s[d]] += 1
+        buf = sum_l[:]
+        sa[buf[s[n - 1]]] = n - 1
+        buf[s[n - 1]] += 1
+        for i in range(n):
+            v = sa[i] - 1
+            if v >= 0 and not ls[v]:
+                sa[buf[s[v]]] = v
+                buf[s[v]] += 1
+        buf = sum_l[:]
+        for i in range(n - 1, -1, -1):
+            v = sa[i] - 1
+            if v >= 0 and ls[v]:
+                buf[s[v] + 1] -= 1
+                sa[buf[s[v] + 1]] = v
+
+    # LMS 位置：前一个为 L 型、自己为 S 型
+    lms = [i for i in range(1, n) if ls[i] and not ls[i - 1]]
+    lms_map = [-1] * (n + 1)
+    for rank, i in enumerate(lms):
+        lms_map[i] = rank
+    induce(lms)
+    m = len(lms)
+    if m:
+        # 给排好序的 LMS 子串编号，相同子串同号，递归排序
+        sorted_lms = [v for v in sa if lms_map[v] != -1]
+        rec_s = [0] * m
+        rec_upper = 0
+        for i in range(1, m):
+            left, right = sorted_lms[i - 1], sorted_lms[i]
+            end_left = lms[lms_map[left] + 1] if lms_map[left] + 1 < m else n
+            end_right = lms[lms_map[right] + 1] if lms_map[right] + 1 < m else n
+            same = end_left - left == end_right - right
+            if same:
+                while left < end_left and s[left] == s[right]:
+                    left += 1
+                    right += 1
+                if left == n or s[left] != s[right]:
+                    same = False
+            if not same:
+                rec_upper += 1
+            rec_s[lms_map[sorted_lms[i]]] = rec_upper
+        rec_sa = sa_is(rec_s, rec_upper)
+        induce([lms[i] for i in rec_sa])
+    return sa
+
+
+def build_suffix_array(text):
+    """全文的后缀数组（array('I')），按字符的码位排序，与 str 的比较一致"""
+    alphabet = {char: rank for rank, char in enumerate(sorted(set(text)))}
+    return array('I', sa_is([alphabet[char] for char in text], max(len(alphabet) - 1, 0)))
+
+
+def write_suffix_array(path, chapters):
+    """对章节正文建后缀数组并写入文件（先写临时文件再改名），返回全文字数
+
+    chapters: [(章节号, 标题, 正文), ...]
+    """
+    text = CHAPTER_SEPARATOR.join(chap_content for _, _, chap_content in chapters)
+    suffix_array = build_suffix_array(text)
+    table, position = array('I'), 0
+    for chap_num, _, chap_content in chapters:
+        table.extend((chap_num, position))
+        position += len(chap_content) + len(CHAPTER_SEPARATOR)
+    titles = '\x00'.join(chap_title.replace('\x00', '') for _, chap_title, _ in chapters).encode('utf-8')
+    body = text.encode('utf-8')
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, SUFFIX_ARRAY_VERSION, 0, len(chapters), len(text), len(body)))
+        f.write(table.tobytes())
+        f.write(struct.pack('<I', len(titles)))
+        f.write(titles)
+        f.write(body)
+        # 后缀数组按 4 字节对齐，便于直接映射
+        f.write(b'\x00' * (-f.tell() % 4))
+        f.write(suffix_array.tobytes())
+    os.replace(temp_path, path)
+    return len(text)
+
+
+def suffix_array_path(output_file):
+    """页面对应的后缀数组文件"""
+    return os.path.splitext(output_file)[0] + '.sa'
+
+
+class SuffixArray:
+    """读取后缀数组文件：正文解码到内存，后缀数组直接映射"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, chapter_count, length, body_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != SUFFIX_ARRAY_VERSION:
+            self.map.close()
+            raise ValueError(f"不是可识别的后缀数组文件: {path}")
+        start = HEADER.size
+        table = array('I', self.map[start:start + 8 * chapter_count])
+        start += 8 * chapter_count
+        titles_size, = struct.unpack_from('<I', self.map, start)
+        start += 4
+        titles = self.map[start:start + titles_size].decode('utf-8').split('\x00')
+        start += titles_size
+        self.text = self.map[start:start + body_size].decode('utf-8')
+        start += body_size + (-(start + body_size) % 4)
+        self.view = memoryview(self.map)
+        self.suffixes = self.view[start:start + 4 * length].cast('I')
+        self.numbers, self.starts = table[0::2], table[1::2]
+        self.titles = titles if chapter_count else []
+
+    def __len__(self):
+        return len(self.text)
+
+    def range(self, query):
+        """后缀数组中以 query 开头的后缀所在区间 [lo, hi)"""
+        text, suffixes, m = self.text, self.suffixes, len(query)
+        lo, hi = 0, len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[suffixes[mid]:suffixes[mid] + m] < query:
+                lo = mid + 1
+            else:
+                hi = mid
+        first, hi = lo, len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[suffixes[mid]:suffixes[mid] + m] == query:
+                lo = mid + 1
+            else:
+                hi = mid
+        return first, lo
+
+    def count(self, query):
+        first, last = self.range(query)
+        return last - first
+
+    def find(self, query):
+        """query 在全文中出现的所有位置（升序）"""
+        first, last = self.range(query)
+        return sorted(self.suffixes[first:last])
+
+    def chapter(self, position):
+        """位置所在章节的 (章节号, 标题, 章节起点, 章节终点)"""
+        i = bisect_right(self.starts, position) - 1
+        end = self.starts[i + 1] - len(CHAPTER_SEPARATOR) if i + 1 < len(self.starts) else len(self.text)
+        return self.numbers[i], self.titles[i], self.starts[i], end
+
+    def close(self):
+        self.suffixes.release()
+        self.view.release()
+        self.map.close()
+
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="xds.py query", description="在 --suffix-array 生成的后缀数组中查找子串")
+    parser.add_argument('path', help="后缀数组文件（.sa）")
+    parser.add_argument('query', help="查询的子串（精确匹配）")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="显示的命中数 (默认: 20)")
+    return parser
+
+
+def main(argv=None):
+    """后缀数组查询入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    try:
+        index = SuffixArray(args.path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"错误: 无法读取 '{args.path}': {e}")
+        return 1
+    start_time = time.perf_counter()
+    positions = index.find(args.query)
+    elapsed = (time.perf_counter() - start_time) * 1000
+
+    print(f'"{args.query}" 出现 {len(positions)} 次（{elapsed:.1f} ms）')
+    for position in positions[:args.limit]:
+        chap_num, chap_title, chap_start, chap_end = index.chapter(position)
+        start = max(chap_start, position - SNIPPET_CONTEXT)
+        end = min(chap_end, position + len(args.query) + SNIPPET_CONTEXT)
+        excerpt = index.text[start:position] + f'【{args.query}】' + index.text[position + len(args.query):end]
+        print(f"  #chap-{chap_num} {chap_title}: {excerpt.replace(chr(10), ' ')}")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())